@@ -0,0 +1,154 @@
+# tempo_arrow.py
+# 추출 결과를 granule마다 Arrow IPC(Feather v2) 파일로 저장 + 메모리 맵 리더
+# - 파일: ARROW_DIR/<kind>/<YYYY-MM-DD>/<granule 이름>.arrow (granule 하나 = record batch 하나)
+# - 비압축(기본)이면 읽을 때 파일 페이지를 그대로 메모리 맵 → 복사/파싱 없음.
+#   여러 프로세스가 같은 파일을 열면 OS 페이지 캐시를 공유 (프로세스마다 CSV 전체 사본을 들지 않음)
+# - "lz4"는 디스크를 줄이지만 읽을 때 압축 해제(복사)가 필요 → 공유/zero-copy 이점은 없어짐
+# - 열 구성은 추출기(긴 형식)와 같음: time_utc, 위도, 경도, <제품 값>, cloud_fraction, units, source_file, product_kind
+#   source_file/product_kind는 사전(dictionary) 인코딩 열 + 스키마 메타데이터로도 기록
+
+import os, time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from glob import glob
+
+from tempo_l3_products import PRODUCTS, kind_from_filename, time_from_filename
+
+# ===== 사용자 설정 (단독 실행: 폴더의 granule → Arrow) =====
+IN_DIR      = r""
+ARROW_DIR   = r""
+KINDS       = ("no2", "o3", "hcho")
+BBOX        = (-74.3, 40.4, -73.6, 41.0)   # NYC
+COMPRESSION = None        # None(비압축, 메모리 맵 zero-copy) / "lz4"
+
+TOOL = "tempo_arrow.py"
+LAT_CANDS = ["latitude", "lat"]   # 추출 DataFrame의 위경도 열 이름 (격자 변수 이름을 그대로 씀)
+LON_CANDS = ["longitude", "lon"]
+
+def _utc(ts):
+    if ts is None:
+        return None
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+def granule_path(arrow_dir: str, kind: str, fname: str) -> str:
+    day = time_from_filename(fname).strftime("%Y-%m-%d")
+    return os.path.join(arrow_dir, kind, day, os.path.splitext(fname)[0] + ".arrow")
+
+def product_schema(kind: str) -> pa.Schema:
+    """제품별 고정 열의 스키마 (granule이 없는 기간의 빈 Table용, 보조 열은 없음)"""
+    return pa.schema([("time_utc", pa.timestamp("ms", tz="UTC")), ("latitude", pa.float64()),
+                      ("longitude", pa.float64()), (PRODUCTS[kind]["column"], pa.float64()),
+                      ("cloud_fraction", pa.float64()), ("units", pa.string()),
+                      ("source_file", pa.dictionary(pa.int32(), pa.string())),
+                      ("product_kind", pa.dictionary(pa.int32(), pa.string()))])
+
+def to_table(df: pd.DataFrame, kind: str, source_file: str) -> pa.Table:
+    """추출 DataFrame → 제품별 고정 스키마 Table (granule 간 스키마가 같아 그대로 이어 붙일 수 있음)"""
+    col = PRODUCTS[kind]["column"]
+    df = df.copy()
+    df["time_utc"] = pd.to_datetime(df["time_utc"], utc=True)
+    if "cloud_fraction" not in df.columns:
+        df["cloud_fraction"] = np.nan
+    for c in ("units", "source_file", "product_kind"):
+        if c not in df.columns:
+            df[c] = {"source_file": source_file, "product_kind": kind}.get(c, "")
+    lat = next((c for c in LAT_CANDS if c in df.columns), None)
+    lon = next((c for c in LON_CANDS if c in df.columns), None)
+    if lat is None or lon is None:
+        raise ValueError(f"위경도 열을 찾지 못함: {list(df.columns)}")
+    head = ["time_utc", lat, lon, col, "cloud_fraction", "units", "source_file", "product_kind"]
+    df = df[head + [c for c in df.columns if c not in head]]
+
+    tbl = pa.Table.from_pandas(df, preserve_index=False)
+    fields = []
+    for f in tbl.schema:
+        if f.name == "time_utc":
+            t = pa.timestamp("ms", tz="UTC")
+        elif f.name in ("source_file", "product_kind"):
+            t = pa.dictionary(pa.int32(), pa.string())
+        elif f.name == "units":
+            t = pa.string()
+        elif pa.types.is_null(f.type):
+            t = pa.float64()  # 값이 전부 비어 있는 열 (구름 변수 없음 등)
+        else:
+            t = f.type
+        fields.append(pa.field(f.name, t))
+    meta = {"source_file": source_file, "product_kind": kind, "tool": TOOL,
+            "units": str(df["units"].iloc[0]) if len(df) else ""}
+    return tbl.cast(pa.schema(fields)).replace_schema_metadata(meta)
+
+def write_granule(df: pd.DataFrame, kind: str, source_file: str, arrow_dir: str = ARROW_DIR,
+                  compression=COMPRESSION) -> str:
+    """granule 하나의 추출 행 → .arrow 파일 (같은 granule이면 덮어씀). 경로 반환"""
+    tbl = to_table(df, kind, source_file)
+    path = granule_path(arrow_dir, kind, source_file)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    opts = pa.ipc.IpcWriteOptions(compression=compression)
+    with pa.OSFile(path + ".part", "wb") as sink:
+        with pa.ipc.new_file(sink, tbl.schema, options=opts) as w:
+            w.write_table(tbl, max_chunksize=max(len(tbl), 1))  # granule 하나 = batch 하나
+    os.replace(path + ".part", path)
+    return path
+
+# ===== 읽기 =====
+def open_granule(path: str) -> pa.Table:
+    """메모리 맵으로 열기 (비압축이면 버퍼가 파일 페이지를 직접 가리킴, 맵은 Table이 살아 있는 동안 유지)"""
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+def granule_metadata(path: str) -> dict:
+    """스키마 메타데이터만 (데이터는 읽지 않음)"""
+    schema = pa.ipc.open_file(pa.memory_map(path, "r")).schema
+    return {k.decode(): v.decode() for k, v in (schema.metadata or {}).items()}
+
+def granule_files(arrow_dir: str, kind: str, start=None, end=None) -> list:
+    """날짜 폴더로 먼저 거른 granule 파일 목록 (시각순). start/end는 UTC, end 미포함"""
+    start, end = _utc(start), _utc(end)
+    out = []
+    for d in sorted(glob(os.path.join(arrow_dir, kind, "*"))):
+        day = pd.Timestamp(os.path.basename(d), tz="UTC")
+        if (start is not None and day + pd.Timedelta(days=1) <= start) or (end is not None and day >= end):
+            continue
+        for p in glob(os.path.join(d, "*.arrow")):
+            t = time_from_filename(os.path.basename(p))
+            if (start is None or t >= start) and (end is None or t < end):
+                out.append((t, p))
+    return [p for _, p in sorted(out)]
+
+def open_table(arrow_dir: str, kind: str, start=None, end=None, columns=None) -> pa.Table:
+    """기간의 granule들을 메모리 맵으로 열어 한 Table로 (chunk = granule, 데이터 복사 없음)"""
+    tables = [open_granule(p) for p in granule_files(arrow_dir, kind, start, end)]
+    if not tables:
+        tbl = product_schema(kind).empty_table()  # 빈 기간도 열 이름/타입은 같게
+        return tbl.select(columns) if columns else tbl
+    # 열 dtype이 granule마다 다르면(구름 변수 유무 등) 넓은 쪽으로 맞춤 — 그 경우만 해당 열 복사
+    tbl = pa.concat_tables([t.replace_schema_metadata(None) for t in tables], promote_options="permissive")
+    return tbl.select(columns) if columns else tbl
+
+def open_frame(arrow_dir: str, kind: str, start=None, end=None, columns=None) -> pd.DataFrame:
+    """pandas로 (숫자 열은 split_blocks로 가능하면 복사 없이 변환)"""
+    return open_table(arrow_dir, kind, start, end, columns).to_pandas(split_blocks=True)
+
+def main():
+    from tempo_l3_extract import extract_rows
+    files = [p for p in sorted(glob(os.path.join(IN_DIR, "*.nc"))) if kind_from_filename(p) in KINDS]
+    if not files:
+        raise FileNotFoundError(f".nc 파일이 없습니다: {IN_DIR}")
+    t = time.perf_counter()
+    for p in files:
+        fname, kind = os.path.basename(p), kind_from_filename(p)
+        try:
+            df = extract_rows(p, kind, BBOX)
+            write_granule(df, kind, fname, ARROW_DIR, COMPRESSION)
+            print(f"[OK] {fname} rows={len(df):,}")
+        except Exception as e:
+            print(f"[SKIP] {fname} -> {e}")
+    print(f"▶ 저장 {time.perf_counter() - t:.1f}s")
+    for kind in KINDS:
+        tbl = open_table(ARROW_DIR, kind)
+        print(f"▶ {kind}: rows={tbl.num_rows:,}, granule={tbl.column(0).num_chunks if tbl.num_columns else 0}")
+    print(f"\n✅ 완료: {ARROW_DIR}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+# tempo_backfill.py
+# 대량 백필(예: 1년 × NO2/O3/HCHO) — 여러 머신에서 나눠 실행하는 샤드 작업 큐
+# - 기간 × 제품을 샤드(기본 하루 × 제품 하나)로 나눠 공유 폴더의 SQLite 큐(QUEUE_DB)에 등록 (외부 서비스 없음)
+# - 어느 머신에서든 같은 설정으로 이 스크립트를 실행하면 작업자가 됨:
+#   샤드 점유(claim, 임대 기한) → 주기적 하트비트로 임대 연장 → granule 검색/다운로드/추출 → 부분 CSV → 완료 기록
+# - 작업자가 죽으면 하트비트가 끊겨 임대가 만료 → 다른 작업자가 그 샤드를 다시 가져감
+# - 실패한 샤드는 지연(RETRY_DELAY_S × 2^(시도-1)) 후 재시도, MAX_ATTEMPTS번 실패하면 failed로 남김
+# - 모든 샤드가 끝나면 부분 CSV를 (시각, 위도, 경도) 순으로 병합 → 어떤 작업자가 언제 처리했든 같은 결과
+# ※ 네트워크 파일시스템에서는 WAL을 쓸 수 없으므로(공유 메모리 필요) 롤백 저널 + BEGIN IMMEDIATE로 잠금
+
+import os, time, socket, sqlite3, threading, shutil
+import multiprocessing as mp
+import pandas as pd
+from glob import glob
+
+from tempo_l3_extract import extract_rows
+from tempo_l3_precheck import precheck
+from tempo_l3_products import PRODUCTS, kind_from_filename, time_from_filename
+
+# ===== 사용자 설정 =====
+QUEUE_DB   = r""                         # 모든 작업자가 보는 공유 경로의 큐 DB (예: r"\\nas\tempo\backfill.sqlite")
+OUT_DIR    = r""                         # 공유 출력 폴더: parts/<kind>/<샤드>.csv, 병합본 <kind>_backfill_NYC.csv
+RAW_DIR    = r""                         # 작업자 로컬 다운로드 폴더 (샤드가 끝나면 비움)
+SOURCE_DIR = r""                         # 지정하면 CMR 대신 이미 받아 둔 granule 폴더에서 선택 (하위 폴더 포함)
+ARROW_DIR  = r""                         # 지정하면 granule마다 Arrow IPC 파일도 저장 (tempo_arrow.py)
+KINDS      = ("no2", "o3", "hcho")
+START, END = "2024-08-01", "2025-08-01"   # UTC, END 미포함
+SHARD_DAYS = 1
+BBOX       = (-74.3, 40.4, -73.6, 41.0)   # NYC
+REMOVE_NEGATIVE = True                   # NO2/HCHO만 적용 (PRODUCTS[...]["remove_negative"])
+PRECHECK   = True
+PROCESSES  = 1                           # 이 머신에서 띄울 작업자 프로세스 수
+LEASE_S    = 900                         # 임대 기한 (하트비트가 이만큼 끊기면 죽은 작업자로 봄)
+HEARTBEAT_S = 60
+MAX_ATTEMPTS = 3
+RETRY_DELAY_S = 300
+IDLE_POLL_S = 30                         # 다른 작업자의 샤드가 남아 있을 때 다시 확인하는 간격
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    shard_id    TEXT PRIMARY KEY,      -- <kind>_<YYYYMMDD>_<YYYYMMDD>
+    kind        TEXT NOT NULL,
+    t_start     TEXT NOT NULL,         -- UTC ISO, 포함
+    t_end       TEXT NOT NULL,         -- UTC ISO, 미포함
+    status      TEXT NOT NULL DEFAULT 'pending',   -- pending / running / done / failed
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    not_before  REAL NOT NULL DEFAULT 0,           -- 재시도 가능 시각 (epoch 초)
+    worker      TEXT,
+    lease_until REAL,
+    started_at  REAL,
+    finished_at REAL,
+    n_granules  INTEGER,
+    n_rows      INTEGER,
+    output      TEXT,                  -- OUT_DIR 기준 상대 경로 (행이 없으면 NULL)
+    error       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_shards_status ON shards(status, not_before, t_start);
+"""
+LAT_CANDS = ["latitude", "lat"]   # 부분 CSV의 위경도 열 이름 (격자 변수 이름을 그대로 씀)
+LON_CANDS = ["longitude", "lon"]
+
+def _iso(ts: pd.Timestamp) -> str:
+    return ts.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _utc(ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+# ===== 큐 =====
+def connect(db_path: str = QUEUE_DB) -> sqlite3.Connection:
+    if os.path.dirname(db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    con = sqlite3.connect(db_path, timeout=120, isolation_level=None)  # 트랜잭션은 직접 BEGIN
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=DELETE")
+    con.executescript(SCHEMA)
+    return con
+
+def make_shards(kinds, start, end, shard_days: int = SHARD_DAYS) -> list:
+    """[{shard_id, kind, t_start, t_end}] — 날짜 경계로 자른 구간 × 제품"""
+    start, end = _utc(start).floor("D"), _utc(end)
+    bounds = list(pd.date_range(start, end, freq=f"{shard_days}D", inclusive="left")) + [end]
+    out = []
+    for kind in kinds:
+        for t0, t1 in zip(bounds[:-1], bounds[1:]):
+            out.append({"shard_id": f"{kind}_{t0:%Y%m%d}_{t1:%Y%m%d}", "kind": kind,
+                        "t_start": _iso(t0), "t_end": _iso(t1)})
+    return out
+
+def enqueue(con: sqlite3.Connection, shards) -> int:
+    """샤드 등록 (이미 있는 샤드는 그대로 → 여러 작업자가 동시에 실행해도 됨). 새로 등록한 수 반환"""
+    con.execute("BEGIN IMMEDIATE")
+    n = con.total_changes
+    con.executemany("INSERT OR IGNORE INTO shards (shard_id, kind, t_start, t_end) "
+                    "VALUES (:shard_id, :kind, :t_start, :t_end)", shards)
+    n = con.total_changes - n
+    con.execute("COMMIT")
+    return n
+
+def claim(con: sqlite3.Connection, worker: str, lease_s: float = LEASE_S,
+          max_attempts: int = MAX_ATTEMPTS):
+    """처리할 샤드 하나를 원자적으로 점유. 대기 중이거나 임대가 만료된 샤드 중 가장 이른 것. 없으면 None"""
+    now = time.time()
+    con.execute("BEGIN IMMEDIATE")  # 쓰기 잠금: 두 작업자가 같은 샤드를 가져가지 않음
+    try:
+        # 임대 만료 + 시도 횟수 소진 → failed
+        con.execute("UPDATE shards SET status='failed', error=coalesce(error, '') || ' [임대 만료]' "
+                    "WHERE status='running' AND lease_until < ? AND attempts >= ?", (now, max_attempts))
+        row = con.execute("""SELECT * FROM shards
+                             WHERE (status='pending' AND not_before <= ?)
+                                OR (status='running' AND lease_until < ?)
+                             ORDER BY t_start, kind LIMIT 1""", (now, now)).fetchone()
+        if row is not None:
+            con.execute("""UPDATE shards SET status='running', worker=?, attempts=attempts+1,
+                           lease_until=?, started_at=?, error=NULL WHERE shard_id=?""",
+                        (worker, now + lease_s, now, row["shard_id"]))
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    return None if row is None else {**dict(row), "worker": worker, "attempts": row["attempts"] + 1}
+
+def heartbeat(con: sqlite3.Connection, shard_id: str, worker: str, lease_s: float = LEASE_S) -> bool:
+    """임대 연장. 샤드를 이미 잃었으면(만료 후 다른 작업자가 가져감) False"""
+    cur = con.execute("UPDATE shards SET lease_until=? WHERE shard_id=? AND worker=? AND status='running'",
+                      (time.time() + lease_s, shard_id, worker))
+    return cur.rowcount == 1
+
+def complete(con: sqlite3.Connection, shard_id: str, worker: str, output, n_granules: int, n_rows: int) -> bool:
+    cur = con.execute("""UPDATE shards SET status='done', finished_at=?, output=?, n_granules=?, n_rows=?,
+                         lease_until=NULL WHERE shard_id=? AND worker=? AND status='running'""",
+                      (time.time(), output, n_granules, n_rows, shard_id, worker))
+    return cur.rowcount == 1
+
+def fail(con: sqlite3.Connection, shard_id: str, worker: str, error: str,
+         max_attempts: int = MAX_ATTEMPTS, retry_delay_s: float = RETRY_DELAY_S) -> str:
+    """실패 기록 → 재시도 대기(pending) 또는 최종 실패(failed). 바뀐 상태 반환"""
+    row = con.execute("SELECT attempts FROM shards WHERE shard_id=?", (shard_id,)).fetchone()
+    status = "failed" if row["attempts"] >= max_attempts else "pending"
+    con.execute("""UPDATE shards SET status=?, error=?, not_before=?, lease_until=NULL
+                   WHERE shard_id=? AND worker=? AND status='running'""",
+                (status, error[:2000], time.time() + retry_delay_s * 2 ** (row["attempts"] - 1),
+                 shard_id, worker))
+    return status
+
+def queue_status(con: sqlite3.Connection) -> dict:
+    return {r["status"]: r["n"] for r in con.execute("SELECT status, count(*) AS n FROM shards GROUP BY status")}
+
+def reset_failed(con: sqlite3.Connection) -> int:
+    """최종 실패한 샤드를 시도 횟수 0으로 되돌림 (원인을 고친 뒤 다시 돌릴 때)"""
+    return con.execute("UPDATE shards SET status='pending', attempts=0, not_before=0 "
+                       "WHERE status='failed'").rowcount
+
+class Heartbeat(threading.Thread):
+    """샤드를 처리하는 동안 HEARTBEAT_S마다 임대 연장 (sqlite 연결은 스레드 간 공유 불가 → 자체 연결)"""
+
+    def __init__(self, db_path: str, shard_id: str, worker: str, interval_s: float = HEARTBEAT_S,
+                 lease_s: float = LEASE_S):
+        super().__init__(daemon=True)
+        self.db_path, self.shard_id, self.worker = db_path, shard_id, worker
+        self.interval_s, self.lease_s = interval_s, lease_s
+        self.stop_evt, self.lost = threading.Event(), threading.Event()
+
+    def run(self):
+        con = connect(self.db_path)
+        try:
+            while not self.stop_evt.wait(self.interval_s):
+                try:
+                    if not heartbeat(con, self.shard_id, self.worker, self.lease_s):
+                        self.lost.set()  # 다른 작업자에게 넘어감 → 작업 중단
+                        return
+                except sqlite3.OperationalError as e:
+                    print(f"[WARN] 하트비트 실패 ({self.shard_id}) -> {e}")  # 잠금 경합 등: 다음 주기에 다시
+        finally:
+            con.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_evt.set()
+        self.join()
+
+# ===== granule 원천 =====
+class CmrSource:
+    """CMR 검색 + 적응형 다운로드 스케줄러(오래된 것부터)"""
+
+    def __init__(self, search: dict, bbox, raw_dir: str):
+        import earthaccess
+        if not earthaccess.login(persist=True):
+            raise RuntimeError("Earthdata 로그인 실패")
+        self.ea, self.search_kw, self.bbox, self.raw_dir = earthaccess, search, bbox, raw_dir
+
+    def granules(self, kind: str, t0: pd.Timestamp, t1: pd.Timestamp, work_dir: str) -> list:
+        from tempo_download_scheduler import DownloadScheduler, jobs_from_granules
+        results = self.ea.search_data(temporal=(_iso(t0), _iso(t1)), bounding_box=self.bbox,
+                                      **self.search_kw[kind])
+        # CMR 시간 조건은 구간 겹침 → 경계 granule은 시작 시각으로 한 샤드에만 배정
+        jobs = [j for j in jobs_from_granules(results, work_dir) if t0.timestamp() <= j["time"] < t1.timestamp()]
+        os.makedirs(work_dir, exist_ok=True)
+        rep = DownloadScheduler(session_factory=self.ea.get_requests_https_session).run(jobs, order="oldest")
+        if rep["failed"]:  # 일부만 받은 샤드는 완료로 기록하지 않고 재시도
+            raise RuntimeError(f"다운로드 실패 {len(rep['failed'])}/{len(jobs)}개: {rep['failed'][0][1]}")
+        return rep["files"]
+
+    def release(self, work_dir: str):
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+class FolderSource:
+    """이미 받아 둔 granule 폴더(공유 저장소 등)에서 샤드 구간의 파일만 선택 (복사/삭제 없음)"""
+
+    def __init__(self, src_dir: str):
+        self.files = {}
+        for p in glob(os.path.join(src_dir, "**", "*.nc"), recursive=True):
+            try:
+                self.files.setdefault(kind_from_filename(p), []).append((time_from_filename(os.path.basename(p)), p))
+            except ValueError:
+                continue
+
+    def granules(self, kind: str, t0: pd.Timestamp, t1: pd.Timestamp, work_dir: str) -> list:
+        return [p for t, p in sorted(self.files.get(kind, [])) if t0 <= t < t1]
+
+    def release(self, work_dir: str):
+        pass
+
+# ===== 샤드 처리 =====
+def part_path(kind: str, shard_id: str) -> str:
+    return os.path.join("parts", kind, f"{shard_id}.csv")
+
+def run_shard(shard: dict, source, out_dir: str, raw_dir: str, hb: Heartbeat = None):
+    """샤드 하나 → 부분 CSV (같은 샤드를 다시 돌리면 같은 파일을 덮어씀). (출력 상대 경로 또는 None, granule 수, 행 수)"""
+    kind = shard["kind"]
+    work_dir = os.path.join(raw_dir, shard["shard_id"])
+    try:
+        paths = source.granules(kind, _utc(shard["t_start"]), _utc(shard["t_end"]), work_dir)
+        parts = []
+        for p in paths:
+            if hb is not None and hb.lost.is_set():
+                raise RuntimeError("임대를 잃음 (다른 작업자가 처리 중)")
+            if PRECHECK and not precheck(p, kind, BBOX)[0]:
+                continue
+            df = extract_rows(p, kind, BBOX, REMOVE_NEGATIVE)  # 손상 granule은 예외 → 샤드 재시도
+            if len(df):
+                parts.append(df)
+                if ARROW_DIR:
+                    from tempo_arrow import write_granule
+                    write_granule(df, kind, os.path.basename(p), ARROW_DIR)
+    finally:
+        source.release(work_dir)
+    if not parts:
+        return None, len(paths), 0
+    df = pd.concat(parts, ignore_index=True)
+    rel = part_path(kind, shard["shard_id"])
+    dst = os.path.join(out_dir, rel)
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = f"{dst}.{socket.gethostname()}.{os.getpid()}.part"
+    df.to_csv(tmp, index=False, encoding="utf-8")
+    os.replace(tmp, dst)
+    return rel, len(paths), len(df)
+
+def work(db_path: str = QUEUE_DB, out_dir: str = OUT_DIR, raw_dir: str = RAW_DIR,
+         source_dir: str = SOURCE_DIR, max_shards: int = None) -> int:
+    """작업자 루프: 처리할 샤드가 없고 다른 작업자의 샤드도 모두 끝날 때까지. 처리한 샤드 수 반환"""
+    me = worker_name()
+    con = connect(db_path)
+    search = {k: p["cmr"] for k, p in PRODUCTS.items()}  # 제품별 CMR 검색 조건 (tempo_l3_products)
+    source = FolderSource(source_dir) if source_dir else CmrSource(search, BBOX, raw_dir)
+    n = 0
+    while max_shards is None or n < max_shards:
+        shard = claim(con, me, LEASE_S, MAX_ATTEMPTS)
+        if shard is None:
+            left = con.execute("SELECT count(*) FROM shards WHERE status IN ('pending', 'running')").fetchone()[0]
+            if not left:
+                break
+            time.sleep(IDLE_POLL_S)  # 재시도 대기 또는 다른 작업자 처리 중 (죽었으면 임대 만료 후 가져옴)
+            continue
+        t = time.perf_counter()
+        try:
+            with Heartbeat(db_path, shard["shard_id"], me, HEARTBEAT_S, LEASE_S) as hb:
+                rel, n_gran, n_rows = run_shard(shard, source, out_dir, raw_dir, hb)
+            if complete(con, shard["shard_id"], me, rel, n_gran, n_rows):
+                print(f"[OK] {shard['shard_id']} granule={n_gran} rows={n_rows:,} ({time.perf_counter() - t:.1f}s)")
+            else:
+                print(f"[SKIP] {shard['shard_id']} -> 임대를 잃어 완료 기록 안 함")
+        except Exception as e:
+            status = fail(con, shard["shard_id"], me, f"{type(e).__name__}: {e}", MAX_ATTEMPTS, RETRY_DELAY_S)
+            print(f"[SKIP] {shard['shard_id']} (시도 {shard['attempts']}) -> {e} → {status}")
+        n += 1
+    con.close()
+    return n
+
+# ===== 병합 =====
+def merge(db_path: str = QUEUE_DB, out_dir: str = OUT_DIR, kinds=KINDS) -> dict:
+    """완료된 샤드의 부분 CSV → 제품별 병합본 {kind: 경로}. 샤드 순서·처리 작업자와 무관하게 같은 결과"""
+    con = connect(db_path)
+    out = {}
+    for kind in kinds:
+        rows = con.execute("SELECT output FROM shards WHERE kind=? AND status='done' AND output IS NOT NULL "
+                           "ORDER BY t_start", (kind,)).fetchall()
+        if not rows:
+            continue
+        df = pd.concat([pd.read_csv(os.path.join(out_dir, r["output"])) for r in rows], ignore_index=True)
+        lat = next((c for c in LAT_CANDS if c in df.columns), None)
+        lon = next((c for c in LON_CANDS if c in df.columns), None)
+        if lat is None or lon is None:
+            raise RuntimeError(f"{kind}: 위경도 열을 찾지 못함: {list(df.columns)}")
+        df = df.drop_duplicates(subset=["source_file", lat, lon])
+        df = df.sort_values(["time_utc", lat, lon, "source_file"], kind="mergesort").reset_index(drop=True)
+        dst = os.path.join(out_dir, f"{kind}_backfill_NYC.csv")
+        tmp = f"{dst}.{socket.gethostname()}.{os.getpid()}.part"
+        df.to_csv(tmp, index=False, encoding="utf-8")
+        os.replace(tmp, dst)
+        out[kind] = dst
+    con.close()
+    return out
+
+def _run_worker(i: int):
+    work(QUEUE_DB, OUT_DIR, os.path.join(RAW_DIR, f"w{i}"), SOURCE_DIR)
+
+def main():
+    os.makedirs(OUT_DIR, exist_ok=True)
+    con = connect(QUEUE_DB)
+    n_new = enqueue(con, make_shards(KINDS, START, END, SHARD_DAYS))
+    print(f"▶ 샤드 {n_new}개 새로 등록, 큐 상태: {queue_status(con)}")
+
+    t = time.perf_counter()
+    if PROCESSES > 1:
+        procs = [mp.Process(target=_run_worker, args=(i,)) for i in range(PROCESSES)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+    else:
+        _run_worker(0)
+    st = queue_status(con)
+    print(f"▶ 작업 종료 ({time.perf_counter() - t:.1f}s), 큐 상태: {st}")
+
+    if set(st) <= {"done"}:
+        for kind, path in merge(QUEUE_DB, OUT_DIR, KINDS).items():
+            print(f"▶ 병합: {path}")
+        print("\n✅ 완료")
+    else:
+        for r in con.execute("SELECT shard_id, attempts, error FROM shards WHERE status='failed' ORDER BY shard_id"):
+            print(f" - 실패 {r['shard_id']} (시도 {r['attempts']}): {r['error']}")
+        print("\n⚠ 끝나지 않은 샤드가 있어 병합하지 않음 (reset_failed() 후 다시 실행)")
+    con.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# tempo_catalog.py
+# 로컬 granule 카탈로그 (SQLite)
+# - 수집(ingest) 때 한 번만 기록: 제품/버전/스캔·granule 번호, 시작/중간/끝 시각, 크기/해시,
+#   공간 범위(footprint), 영역별 유효 픽셀 수
+# - 이후 추출·집계·다운로드는 디렉터리 스캔이나 파일을 열어 보지 않고 인덱스 질의로 granule 선택
+
+import os, time, hashlib, sqlite3
+import numpy as np
+import pandas as pd
+import netCDF4
+from glob import glob
+from typing import Optional
+
+from tempo_l3_grid import load_grid, nc_window
+from tempo_l3_products import (PRODUCTS, kind_from_filename, version_from_filename,
+                               scan_from_filename, coverage_times, pick_main_var)
+
+# ===== 사용자 설정 =====
+CATALOG_DB = r""                                 # 예: r"D:\tempo\catalog.sqlite"
+IN_DIR     = r""                                 # 수집할 .nc 폴더 (하위 폴더 포함)
+REGIONS    = {"nyc": (-74.3, 40.4, -73.6, 41.0)}  # 영역별 유효 픽셀 수를 미리 세어 둠
+HASH_MODE  = "quick"  # "quick": 크기 + 앞/뒤 1 MiB sha1, "full": 전체 sha1, None: 생략
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS granules (
+    path        TEXT PRIMARY KEY,
+    fname       TEXT NOT NULL,
+    product     TEXT,
+    version     TEXT,
+    scan        INTEGER,
+    granule     INTEGER,
+    time_start  REAL,          -- UTC epoch 초
+    time_mid    REAL,
+    time_end    REAL,
+    file_size   INTEGER,
+    mtime       REAL,
+    hash        TEXT,
+    lat_min     REAL, lat_max REAL, lon_min REAL, lon_max REAL,
+    grid_fp     TEXT,
+    ingested_at REAL
+);
+CREATE TABLE IF NOT EXISTS coverage (
+    path     TEXT NOT NULL REFERENCES granules(path) ON DELETE CASCADE,
+    region   TEXT NOT NULL,
+    n_pixels INTEGER,
+    n_valid  INTEGER,
+    PRIMARY KEY (path, region)
+);
+CREATE INDEX IF NOT EXISTS idx_granules_product_time ON granules(product, time_start, time_end);
+CREATE INDEX IF NOT EXISTS idx_granules_fname        ON granules(fname);
+CREATE INDEX IF NOT EXISTS idx_coverage_region       ON coverage(region, n_valid);
+"""
+
+def connect(db_path: str = CATALOG_DB) -> sqlite3.Connection:
+    if os.path.dirname(db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    con = sqlite3.connect(db_path, timeout=60)
+    con.execute("PRAGMA journal_mode=WAL")   # 읽기(추출)와 쓰기(수집)가 동시에 가능
+    con.execute("PRAGMA foreign_keys=ON")
+    con.executescript(SCHEMA)
+    return con
+
+def file_hash(path: str, mode: Optional[str] = HASH_MODE) -> Optional[str]:
+    if mode is None:
+        return None
+    h = hashlib.sha1()
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if mode == "full":
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        else:
+            h.update(str(size).encode())
+            h.update(f.read(1 << 20))
+            if size > (2 << 20):
+                f.seek(-(1 << 20), os.SEEK_END)
+                h.update(f.read(1 << 20))
+    return f"{mode}:{h.hexdigest()}"
+
+def _epoch(ts) -> float:
+    ts = pd.Timestamp(ts)
+    ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+    return ts.value / 1e9
+
+def _footprint(attrs, grid):
+    # 전역 속성(geospatial_*)이 있으면 그것, 없으면 격자 범위
+    keys = ("geospatial_lat_min", "geospatial_lat_max", "geospatial_lon_min", "geospatial_lon_max")
+    if all(k in attrs for k in keys):
+        return tuple(float(attrs[k]) for k in keys)
+    return (float(np.nanmin(grid["lat"])), float(np.nanmax(grid["lat"])),
+            float(np.nanmin(grid["lon"])), float(np.nanmax(grid["lon"])))
+
+def region_counts(nc: netCDF4.Dataset, kind: str, grid: dict, regions: dict) -> dict:
+    """영역별 (창 픽셀 수, 유효 픽셀 수). 메인 변수의 영역 창만 읽음"""
+    if not regions:
+        return {}
+    grp = nc.groups.get("product", nc)
+    var = grp.variables[pick_main_var(grp, kind)]
+    out = {}
+    for name, bbox in regions.items():
+        arr = nc_window(var, grid, bbox)
+        ok = np.isfinite(arr)
+        if PRODUCTS[kind]["remove_negative"]:
+            ok &= arr > 0
+        out[name] = (int(arr.size), int(ok.sum()))
+    return out
+
+def ingest_file(con: sqlite3.Connection, path: str, regions: dict = REGIONS,
+                hash_mode: Optional[str] = HASH_MODE, force: bool = False) -> bool:
+    """granule 하나를 카탈로그에 기록. 크기/수정시각이 같으면 건너뜀. 기록했으면 True"""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    if not force:
+        row = con.execute("SELECT file_size, mtime FROM granules WHERE path=?", (path,)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime:
+            return False
+
+    fname = os.path.basename(path)
+    kind = kind_from_filename(fname)
+    scan, gran = scan_from_filename(fname)
+    grid = load_grid(path)
+    with netCDF4.Dataset(path) as nc:
+        attrs = {k: nc.getncattr(k) for k in nc.ncattrs()}
+        t0, t1, tm = coverage_times(attrs, fname)
+        lat_min, lat_max, lon_min, lon_max = _footprint(attrs, grid)
+        counts = region_counts(nc, kind, grid, regions) if kind else {}
+
+    with con:
+        con.execute("DELETE FROM coverage WHERE path=?", (path,))
+        con.execute(
+            "INSERT OR REPLACE INTO granules VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            (path, fname, kind, version_from_filename(fname), scan, gran,
+             _epoch(t0), _epoch(tm), _epoch(t1), st.st_size, st.st_mtime,
+             file_hash(path, hash_mode), lat_min, lat_max, lon_min, lon_max,
+             grid["fingerprint"], time.time()))
+        con.executemany("INSERT INTO coverage VALUES (?,?,?,?)",
+                        [(path, r, n, v) for r, (n, v) in counts.items()])
+    return True
+
+def ingest_files(con: sqlite3.Connection, paths, regions: dict = REGIONS,
+                 hash_mode: Optional[str] = HASH_MODE):
+    """여러 파일 수집. (새로 기록, 건너뜀, 실패) 개수 반환"""
+    added = skipped = failed = 0
+    for p in paths:
+        try:
+            if ingest_file(con, p, regions, hash_mode):
+                added += 1
+            else:
+                skipped += 1
+        except Exception as e:
+            failed += 1
+            print(f"[SKIP] {os.path.basename(p)} -> {e}")
+    return added, skipped, failed
+
+def has_file(con: sqlite3.Connection, fname: str) -> bool:
+    return con.execute("SELECT 1 FROM granules WHERE fname=? LIMIT 1", (fname,)).fetchone() is not None
+
+def select_granules(con: sqlite3.Connection, product: Optional[str] = None,
+                    start=None, end=None, region: Optional[str] = None, min_valid: int = 1,
+                    version: Optional[str] = None, newest_first: bool = False) -> pd.DataFrame:
+    """조건에 맞는 granule 목록(시각순). 시간창은 [start, end]와 관측 구간이 겹치는 것"""
+    sql = ["SELECT g.*" + (", c.n_pixels, c.n_valid" if region else "") + " FROM granules g"]
+    args = []
+    if region:
+        sql.append("JOIN coverage c ON c.path = g.path AND c.region = ?")
+        args.append(region)
+    where = []
+    if product:
+        where.append("g.product = ?"); args.append(product)
+    if version:
+        where.append("g.version = ?"); args.append(version)
+    if start is not None:
+        where.append("g.time_end >= ?"); args.append(_epoch(start))
+    if end is not None:
+        where.append("g.time_start <= ?"); args.append(_epoch(end))
+    if region and min_valid:
+        where.append("c.n_valid >= ?"); args.append(int(min_valid))
+    if where:
+        sql.append("WHERE " + " AND ".join(where))
+    sql.append("ORDER BY g.time_mid " + ("DESC" if newest_first else "ASC"))
+    return pd.read_sql_query(" ".join(sql), con, params=args)
+
+def select_paths(db_path: str, product: Optional[str] = None, **kw) -> list:
+    """추출 스크립트용: 조건에 맞는 파일 경로 목록"""
+    con = connect(db_path)
+    try:
+        return select_granules(con, product, **kw)["path"].tolist()
+    finally:
+        con.close()
+
+def main():
+    con = connect(CATALOG_DB)
+    files = sorted(glob(os.path.join(IN_DIR, "**", "*.nc"), recursive=True))
+    print(f"▶ 수집 대상: {len(files)}개 ({IN_DIR})")
+    added, skipped, failed = ingest_files(con, files)
+    total = con.execute("SELECT COUNT(*) FROM granules").fetchone()[0]
+    con.close()
+    print(f"\n✅ 완료: 새로 기록 {added}, 변경 없음 {skipped}, 실패 {failed} → 카탈로그 {total:,}개 ({CATALOG_DB})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+# tempo_download_scheduler.py
+# granule 다운로드 스케줄러
+# - 작업 스레드마다 HTTP 세션(연결 풀) 하나를 만들어 끝까지 재사용 (keep-alive, 인증 쿠키 유지)
+# - 동시 다운로드 수를 관측 처리량/오류율로 조절 (AIMD: 좋아지면 +1, 오류가 많으면 절반)
+# - 재시도: 지수 백오프 + 지터 (Retry-After 헤더가 있으면 우선), 대기 중에는 슬롯을 비워 둠
+# - 우선순위: granule 시각 기준 newest(운영) / oldest(백필)
+# - 보고: 전체 MB/s, granule별 지연시간(p50/p90/max), 재시도/실패, 동시성 변화
+# - 벤치마크: 로컬 속도 제한 HTTP 서버(serve_throttled)로 고정 스레드 vs 적응형 비교
+
+import os, time, heapq, random, tempfile, threading
+import requests
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+RETRY_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+def jobs_from_granules(granules, out_dir: str) -> list:
+    """earthaccess 검색 결과 → 다운로드 작업 목록 [{url, path, time}]"""
+    from tempo_l3_products import time_from_filename
+    jobs = []
+    for g in granules:
+        links = g.data_links()
+        if not links:
+            continue
+        fname = links[0].rsplit("/", 1)[-1]
+        try:
+            t = time_from_filename(fname).timestamp()
+        except ValueError:
+            t = 0.0
+        jobs.append({"url": links[0], "path": os.path.join(out_dir, fname), "time": t})
+    return jobs
+
+class DownloadScheduler:
+    def __init__(self, session_factory=requests.Session, min_workers: int = 2, max_workers: int = 16,
+                 start_workers: int = 8, max_retries: int = 5, backoff_base: float = 1.0,
+                 backoff_max: float = 60.0, window: int = 8, err_high: float = 0.2,
+                 chunk: int = 1 << 20, timeout=(10, 120)):
+        self.session_factory = session_factory
+        self.min_workers, self.max_workers = min_workers, max_workers
+        self.start_workers = max(min_workers, min(start_workers, max_workers))
+        self.max_retries = max_retries
+        self.backoff_base, self.backoff_max = backoff_base, backoff_max
+        self.window, self.err_high = window, err_high
+        self.chunk, self.timeout = chunk, timeout
+
+    # ----- 실행 -----
+    def run(self, jobs, order: str = "oldest") -> dict:
+        """작업 목록 실행 후 보고서(dict) 반환. order: "oldest"(백필) / "newest"(운영)"""
+        jobs = sorted(jobs, key=lambda j: j["time"], reverse=(order == "newest"))
+        self._heap = [(0.0, rank, job, 0) for rank, job in enumerate(jobs)]  # (시작 가능 시각, 순위, 작업, 시도)
+        heapq.heapify(self._heap)
+        self._cv = threading.Condition()
+        self._pending, self._active, self._limit = len(jobs), 0, self.start_workers
+        self._done, self._failed, self._latency = {}, [], []
+        self._bytes, self._retries = 0, 0
+        self._win = {"n": 0, "err": 0, "bytes": 0, "t0": time.perf_counter()}
+        self._prev_thr, self._limit_hist = None, [self._limit]
+        self._first_start = {}
+
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=self._worker, daemon=True)
+                   for _ in range(min(self.max_workers, max(1, len(jobs))))]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        elapsed = time.perf_counter() - t0
+
+        lat = sorted(self._latency)
+        pick = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] if lat else 0.0
+        return {
+            "files": [self._done[r] for r in sorted(self._done)],
+            "failed": self._failed,
+            "bytes": self._bytes,
+            "elapsed_s": elapsed,
+            "mb_per_s": self._bytes / 1e6 / elapsed if elapsed > 0 else 0.0,
+            "latency_s": {"p50": pick(0.5), "p90": pick(0.9), "max": lat[-1] if lat else 0.0},
+            "retries": self._retries,
+            "limit_history": self._limit_hist,
+        }
+
+    def _next_job(self):
+        # 슬롯이 있고 시작 가능한 작업이 있을 때까지 대기. 남은 작업이 없으면 None
+        with self._cv:
+            while True:
+                if self._pending == 0:
+                    return None
+                now = time.perf_counter()
+                if self._heap and self._active < self._limit and self._heap[0][0] <= now:
+                    item = heapq.heappop(self._heap)
+                    self._active += 1
+                    return item
+                wait = self._heap[0][0] - now if self._heap and self._heap[0][0] > now else 0.5
+                self._cv.wait(timeout=max(0.01, min(wait, 0.5)))
+
+    def _worker(self):
+        # 세션 기본 어댑터를 그대로 사용: 호스트별 풀을 여러 개 유지하므로 데이터 호스트 → URS → S3/CloudFront
+        # 리디렉션 단계마다 연결이 각각 keep-alive로 재사용됨 (호스트 풀 1개로 덮으면 단계마다 서로 밀어냄)
+        sess = self.session_factory()
+        try:
+            while True:
+                item = self._next_job()
+                if item is None:
+                    return
+                _, rank, job, attempt = item
+                self._first_start.setdefault(rank, time.perf_counter())
+                ok, nbytes, err, retry_after = self._fetch(sess, job)
+                self._finish(rank, job, attempt, ok, nbytes, err, retry_after)
+        finally:
+            sess.close()
+
+    def _fetch(self, sess, job):
+        """(성공, 바이트, 오류 문자열, 재시도 대기초|None). 재시도 불가 오류는 대기초 -1"""
+        tmp = job["path"] + ".part"
+        try:
+            with sess.get(job["url"], stream=True, timeout=self.timeout) as r:
+                if r.status_code >= 400:
+                    if r.status_code not in RETRY_STATUS:
+                        return False, 0, f"HTTP {r.status_code}", -1
+                    ra = r.headers.get("Retry-After")
+                    return False, 0, f"HTTP {r.status_code}", float(ra) if ra and ra.isdigit() else None
+                n = 0
+                with open(tmp, "wb") as f:
+                    for chunk in r.iter_content(self.chunk):
+                        f.write(chunk)
+                        n += len(chunk)
+            os.replace(tmp, job["path"])  # 완전히 받은 파일만 보이도록
+            return True, n, "", None
+        except RETRY_ERRORS as e:
+            return False, 0, type(e).__name__, None
+        except OSError as e:
+            return False, 0, str(e), -1
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _finish(self, rank, job, attempt, ok, nbytes, err, retry_after):
+        with self._cv:
+            self._active -= 1
+            if ok:
+                self._pending -= 1
+                self._done[rank] = job["path"]
+                self._bytes += nbytes
+                self._latency.append(time.perf_counter() - self._first_start[rank])
+            elif retry_after != -1 and attempt + 1 < self.max_retries:
+                delay = retry_after if retry_after is not None else \
+                    min(self.backoff_max, self.backoff_base * 2 ** attempt) * (0.5 + random.random())
+                heapq.heappush(self._heap, (time.perf_counter() + delay, rank, job, attempt + 1))
+                self._retries += 1
+            else:
+                self._pending -= 1
+                self._failed.append((job["url"], err))
+            if ok or retry_after != -1:
+                self._adapt(ok, nbytes)  # 404/로컬 OSError 등 재시도 불가 실패는 처리량/오류율 표본에서 제외
+            self._cv.notify_all()
+
+    def _adapt(self, ok, nbytes):
+        # 창(window)마다 처리량/오류율을 보고 동시성 조절 (오류 = 재시도 가능 HTTP 상태/전송 오류만)
+        w = self._win
+        w["n"] += 1; w["err"] += (not ok); w["bytes"] += nbytes
+        if w["n"] < self.window:
+            return
+        now = time.perf_counter()
+        thr = w["bytes"] / max(now - w["t0"], 1e-6)
+        if w["err"] / w["n"] > self.err_high:
+            self._limit = max(self.min_workers, self._limit // 2)
+        elif self._prev_thr is None or thr >= self._prev_thr * 0.95:
+            self._limit = min(self.max_workers, self._limit + 1)
+        else:
+            self._limit = max(self.min_workers, self._limit - 1)
+        self._prev_thr = thr
+        self._limit_hist.append(self._limit)
+        self._win = {"n": 0, "err": 0, "bytes": 0, "t0": now}
+
+def print_report(rep: dict, title: str = "다운로드"):
+    lat = rep["latency_s"]
+    print(f"▶ {title}: {len(rep['files'])}개 성공, {len(rep['failed'])}개 실패, 재시도 {rep['retries']}회")
+    print(f"  {rep['bytes'] / 1e6:,.1f} MB / {rep['elapsed_s']:.1f}s = {rep['mb_per_s']:.2f} MB/s, "
+          f"granule 지연 p50 {lat['p50']:.2f}s · p90 {lat['p90']:.2f}s · max {lat['max']:.2f}s")
+    print(f"  동시성 변화: {rep['limit_history']}")
+    for url, err in rep["failed"]:
+        print(f"  [FAIL] {url.rsplit('/', 1)[-1]} -> {err}")
+
+# ===== 벤치마크용 로컬 HTTP 서버 =====
+def serve_throttled(root_dir: str, bytes_per_s: float = 4e6, fail_rate: float = 0.0,
+                    latency_s: float = 0.05, port: int = 0) -> ThreadingHTTPServer:
+    """연결당 속도 제한 + 확률적 503을 내는 로컬 서버. server_address[1]이 포트"""
+    class Handler(SimpleHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive → 연결 재사용 효과가 보이도록
+
+        def __init__(self, *a, **kw):
+            super().__init__(*a, directory=root_dir, **kw)
+
+        def log_message(self, *a):
+            pass
+
+        def do_GET(self):
+            time.sleep(latency_s)
+            if random.random() < fail_rate:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            path = self.translate_path(self.path)
+            if not os.path.isfile(path):
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(os.path.getsize(path)))
+            self.end_headers()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(64 << 10), b""):
+                    self.wfile.write(chunk)
+                    time.sleep(len(chunk) / bytes_per_s)
+
+    srv = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+def benchmark(n_files: int = 32, size_mb: float = 2.0, bytes_per_s: float = 4e6, fail_rate: float = 0.05):
+    """고정 8스레드 vs 적응형 스케줄러를 같은 로컬 서버에 대해 비교"""
+    with tempfile.TemporaryDirectory() as src, tempfile.TemporaryDirectory() as dst:
+        for i in range(n_files):
+            with open(os.path.join(src, f"TEMPO_NO2_L3_V03_20250601T{10 + i // 4:02d}{(i % 4) * 15:02d}00Z_S{i:03d}.nc"), "wb") as f:
+                f.write(os.urandom(int(size_mb * 1e6)))
+        srv = serve_throttled(src, bytes_per_s=bytes_per_s, fail_rate=fail_rate)
+        base = f"http://127.0.0.1:{srv.server_address[1]}"
+        names = sorted(os.listdir(src))
+        jobs = [{"url": f"{base}/{n}", "path": os.path.join(dst, n), "time": i} for i, n in enumerate(names)]
+        try:
+            for title, sched in (
+                ("고정 8스레드", DownloadScheduler(min_workers=8, max_workers=8, start_workers=8, backoff_base=0.2)),
+                ("적응형", DownloadScheduler(min_workers=2, max_workers=32, start_workers=8, backoff_base=0.2)),
+            ):
+                for n in os.listdir(dst):
+                    os.remove(os.path.join(dst, n))
+                print_report(sched.run(jobs, order="oldest"), title)
+        finally:
+            srv.shutdown()
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,329 @@
+# tempo_l2_swath.py
+# TEMPO L2 swath(픽셀마다 2차원 불규칙 위경도) 추출 — 출력은 L3 추출기와 같은 긴 형식
+# - swath 위경도에 셀 버킷(cell-bucket) 공간 색인: 픽셀을 CELL_DEG° 셀 번호순으로 정렬하고 셀별 시작 위치만 기록
+#   → BBOX/측정소 조회는 해당 셀의 픽셀만 후보로 삼고, 후보를 덮는 (mirror_step, xtrack) 창만 파일에서 읽음
+#   (측정소별 후보는 자기 셀 + 이웃 셀만, WINDOW_DEG 타일마다 후보를 합친 창을 변수당 한 번 읽고 메모리에서 인덱싱)
+# - 색인은 스캔·granule 번호(S###G##)별로 캐시(메모리 → 디스크 npz): 같은 번호의 granule은 매일 거의 같은 곳을 관측
+#   → 모서리/중심 좌표 5개만 읽어 캐시와 비교, DRIFT_TOL_DEG 안이면 재사용(후보 선택에 같은 여유), 벗어나면 다시 만듦
+# - 후보는 이 granule의 실제 위경도로 다시 정확히 거르므로 캐시가 조금 어긋나도 결과는 같음
+# - 값 마스킹은 L3와 같은 공용 커널(clean_values)
+
+import os, json, time
+import numpy as np
+import pandas as pd
+import xarray as xr
+import netCDF4
+from glob import glob
+from typing import Dict, Optional
+
+from tempo_l3_mask import clean_values
+from tempo_l3_products import (PRODUCTS, kind_from_filename, time_from_filename, scan_from_filename,
+                               pick_main_var, pick_cloud_var, pick_qa_var)
+
+# ===== 사용자 설정 =====
+IN_DIR   = r""
+OUT_CSV  = r""                     # BBOX 픽셀 (L3 추출기와 같은 열)
+BBOX     = (-74.3, 40.4, -73.6, 41.0)
+KINDS    = ("no2", "o3", "hcho")
+REMOVE_NEGATIVE = True             # NO2/HCHO만 적용 (PRODUCTS[...]["remove_negative"])
+QA_MAX   = None                    # 예: 0 → main_data_quality_flag가 0인 픽셀만 (None이면 거르지 않음)
+STATIONS_CSV = r""                 # 지정하면 측정소별 가장 가까운 픽셀도 추출 (tempo_l3_stations.py 표 형식)
+OUT_STATIONS_CSV = r""
+MAX_DIST_KM  = 5.0
+WINDOW_DEG   = 1.0                 # 측정소를 이 크기(도) 타일로 묶어 타일마다 창 하나씩 읽음
+CELL_DEG      = 0.05               # 색인 셀 크기(도)
+DRIFT_TOL_DEG = 0.02               # 캐시 재사용 허용 위치 차이(도)
+SWATH_CACHE_DIR = os.environ.get(
+    "TEMPO_SWATH_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "tempo_l2_swath")
+)  # None이면 메모리 캐시만 사용
+
+GEO_GROUPS  = ("geolocation",)
+DATA_GROUPS = ("product", "support_data")
+LAT_CANDS = ["latitude", "lat"]
+LON_CANDS = ["longitude", "lon"]
+KM_PER_DEG = 111.195
+# CF 시간 단위 → pandas 단위 (모르는 단위는 오류: 첫 글자만 보면 milliseconds가 분(m)이 됨)
+CF_TIME_UNITS = {"days": "D", "day": "D", "d": "D", "hours": "h", "hour": "h", "hr": "h", "h": "h",
+                 "minutes": "min", "minute": "min", "min": "min", "seconds": "s", "second": "s", "sec": "s",
+                 "s": "s", "milliseconds": "ms", "millisecond": "ms", "ms": "ms",
+                 "microseconds": "us", "microsecond": "us", "us": "us"}
+
+_MEM: Dict[str, dict] = {}  # 스캔·granule 키 -> 색인
+
+# ===== 파일 구조 =====
+def _group(nc, names):
+    return next((nc.groups[g] for g in names if g in nc.groups), nc)
+
+def _var(nc, name: str):
+    for g in DATA_GROUPS:
+        if g in nc.groups and name in nc.groups[g].variables:
+            return nc.groups[g].variables[name]
+    return nc.variables[name]
+
+def _names(nc) -> list:
+    return [v for g in DATA_GROUPS if g in nc.groups for v in nc.groups[g].variables]
+
+def geolocation(nc):
+    """(위도 변수, 경도 변수, 시각 변수 또는 None)"""
+    geo = _group(nc, GEO_GROUPS)
+    lat = next((geo.variables[c] for c in LAT_CANDS if c in geo.variables), None)
+    lon = next((geo.variables[c] for c in LON_CANDS if c in geo.variables), None)
+    if lat is None or lon is None or lat.ndim != 2:
+        raise RuntimeError(f"2차원 swath 위경도 없음: {list(geo.variables)}")
+    return lat, lon, geo.variables.get("time")
+
+def _read(var, win=(slice(None), slice(None))) -> np.ndarray:
+    return np.ma.filled(np.ma.asarray(var[win], dtype="f8"), np.nan)
+
+def _probe(lat_v, lon_v) -> np.ndarray:
+    # 모서리 4개 + 중심 좌표 (캐시 일치 확인용, 점 5개만 읽음)
+    ny, nx = lat_v.shape
+    pts = [(0, 0), (0, nx - 1), (ny - 1, 0), (ny - 1, nx - 1), (ny // 2, nx // 2)]
+    return np.array([[_read(lat_v, p), _read(lon_v, p)] for p in pts], dtype="f8")
+
+# ===== 셀 버킷 색인 =====
+def _cell_keys(lat: np.ndarray, lon: np.ndarray, cell_deg: float) -> np.ndarray:
+    ncol = int(round(360.0 / cell_deg))
+    cy = np.floor((lat + 90.0) / cell_deg).astype("i8")
+    cx = np.floor((lon + 180.0) / cell_deg).astype("i8")
+    return cy * ncol + cx
+
+def build_index(lat: np.ndarray, lon: np.ndarray, cell_deg: float = CELL_DEG) -> dict:
+    """픽셀(평탄 인덱스)을 셀 번호순으로 정렬: 셀 keys[i]의 픽셀 = pix[starts[i]:starts[i+1]]"""
+    ok = np.isfinite(lat) & np.isfinite(lon)
+    flat = np.flatnonzero(ok)
+    key = _cell_keys(lat.ravel()[flat], lon.ravel()[flat], cell_deg)
+    order = np.argsort(key, kind="stable")
+    keys, starts = np.unique(key[order], return_index=True)
+    return {"cell_deg": cell_deg, "shape": lat.shape, "pix": flat[order].astype("i4"),
+            "keys": keys, "starts": np.append(starts, flat.size).astype("i8")}
+
+def _cache_path(cache_dir, key):
+    return os.path.join(cache_dir, f"swath_{key}.npz")
+
+def _load_disk(key, cache_dir) -> Optional[dict]:
+    if not cache_dir or not os.path.exists(_cache_path(cache_dir, key)):
+        return None
+    try:
+        with np.load(_cache_path(cache_dir, key), allow_pickle=False) as z:
+            meta = json.loads(str(z["meta"]))
+            return {"cell_deg": meta["cell_deg"], "shape": tuple(meta["shape"]), "pix": z["pix"],
+                    "keys": z["keys"], "starts": z["starts"], "probe": z["probe"]}
+    except Exception:
+        return None  # 손상된 캐시는 무시하고 다시 만듦
+
+def _save_disk(key, idx, cache_dir):
+    if not cache_dir:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(cache_dir, key)
+    meta = json.dumps({"cell_deg": idx["cell_deg"], "shape": list(idx["shape"])})
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, meta=np.array(meta), pix=idx["pix"], keys=idx["keys"], starts=idx["starts"], probe=idx["probe"])
+    os.replace(path + ".tmp", path)
+
+def swath_key(fname: str, shape) -> str:
+    scan, gran = scan_from_filename(fname)
+    base = f"S{scan:03d}G{gran:02d}" if scan is not None and gran is not None else os.path.splitext(fname)[0]
+    return f"{base}_{shape[0]}x{shape[1]}"
+
+def load_index(nc, fname: str, cache_dir: Optional[str] = SWATH_CACHE_DIR, cell_deg: float = CELL_DEG,
+               tol: float = DRIFT_TOL_DEG):
+    """(색인, 출처 "mem"/"disk"/"built"). 스캔·granule 번호가 같고 위치 차이가 tol 안이면 캐시 재사용"""
+    lat_v, lon_v, _ = geolocation(nc)
+    key = swath_key(fname, lat_v.shape)
+    probe = _probe(lat_v, lon_v)
+    for src in ("mem", "disk"):
+        idx = _MEM.get(key) if src == "mem" else _load_disk(key, cache_dir)
+        if idx is None or idx["cell_deg"] != cell_deg or tuple(idx["shape"]) != lat_v.shape:
+            continue
+        if np.array_equal(np.isnan(idx["probe"]), np.isnan(probe)) and \
+                np.nanmax(np.abs(idx["probe"] - probe), initial=0.0) <= tol:
+            _MEM[key] = idx
+            return idx, src
+    idx = build_index(_read(lat_v), _read(lon_v), cell_deg)  # 전체 위경도는 여기서만 읽음
+    idx["probe"] = probe
+    _MEM[key] = idx
+    _save_disk(key, idx, cache_dir)
+    return idx, "built"
+
+def candidates(idx: dict, bbox, margin: float = DRIFT_TOL_DEG) -> np.ndarray:
+    """BBOX(+여유)와 겹치는 셀의 픽셀 평탄 인덱스. bbox=None이면 전체"""
+    if bbox is None:
+        return np.sort(idx["pix"])
+    c = idx["cell_deg"]
+    ncol = int(round(360.0 / c))
+    lon_min, lat_min, lon_max, lat_max = bbox
+    cy0, cy1 = (int(np.floor((v + 90.0) / c)) for v in (lat_min - margin, lat_max + margin))
+    cx0, cx1 = (int(np.floor((v + 180.0) / c)) for v in (lon_min - margin, lon_max + margin))
+    ky, kx = np.divmod(idx["keys"], ncol)
+    sel = np.flatnonzero((ky >= cy0) & (ky <= cy1) & (kx >= cx0) & (kx <= cx1))
+    if not sel.size:
+        return np.empty(0, dtype="i8")
+    s = idx["starts"]
+    return np.sort(np.concatenate([idx["pix"][s[i]:s[i + 1]] for i in sel]))
+
+def pixel_window(idx: dict, flat: np.ndarray):
+    """후보 픽셀을 덮는 최소 (mirror_step, xtrack) 창 + 창 안 행/열 인덱스"""
+    rows, cols = np.divmod(flat, idx["shape"][1])
+    win = (slice(int(rows.min()), int(rows.max()) + 1), slice(int(cols.min()), int(cols.max()) + 1))
+    return win, rows - win[0].start, cols - win[1].start
+
+def station_candidates(idx: dict, lat: np.ndarray, lon: np.ndarray, max_dist_km: float,
+                       margin: float = DRIFT_TOL_DEG) -> list:
+    """측정소마다 자기 셀 + 거리 한도(+여유) 안 이웃 셀의 픽셀 평탄 인덱스 (셀은 keys에서 이진 탐색)"""
+    c, keys, s = idx["cell_deg"], idx["keys"], idx["starts"]
+    ncol = int(round(360.0 / c))
+    dlat = max_dist_km / KM_PER_DEG + margin
+    out = []
+    for la, lo in zip(lat, lon):
+        dlon = max_dist_km / KM_PER_DEG / max(np.cos(np.radians(la)), 1e-6) + margin
+        cy = np.arange(int(np.floor((la - dlat + 90.0) / c)), int(np.floor((la + dlat + 90.0) / c)) + 1)
+        cx = np.arange(int(np.floor((lo - dlon + 180.0) / c)), int(np.floor((lo + dlon + 180.0) / c)) + 1)
+        want = (cy[:, None] * ncol + cx[None, :]).ravel()
+        i = np.minimum(np.searchsorted(keys, want), keys.size - 1)
+        hit = i[keys[i] == want] if keys.size else i[:0]
+        out.append(np.sort(np.concatenate([idx["pix"][s[k]:s[k + 1]] for k in hit]))
+                   if hit.size else np.empty(0, dtype="i8"))
+    return out
+
+# ===== 값 읽기 =====
+def _clean(var, win, rows, cols, remove_negative=False) -> np.ndarray:
+    # 창만 원시로 읽어 공용 마스킹 커널 적용 후 후보 픽셀 값만
+    var.set_auto_maskandscale(False)
+    da = xr.DataArray(var[win], dims=("y", "x"), attrs={k: var.getncattr(k) for k in var.ncattrs()})
+    return clean_values(da, remove_negative=remove_negative).values[rows, cols]
+
+def _row_times(time_v, win, fname: str) -> np.ndarray:
+    # mirror step별 관측 시각 (없으면 파일명 시각)
+    t0 = time_from_filename(fname)
+    n = win[0].stop - win[0].start
+    if time_v is None or "since" not in getattr(time_v, "units", ""):
+        return np.full(n, t0.strftime("%Y-%m-%dT%H:%M:%SZ"), dtype=object)
+    unit, origin = time_v.units.split(" since ")
+    pd_unit = CF_TIME_UNITS.get(unit.strip().lower())
+    if pd_unit is None:
+        raise ValueError(f"알 수 없는 시간 단위: {time_v.units!r}")
+    secs = _read(time_v, win[0])
+    ts = pd.Timestamp(origin.strip().replace("Z", ""), tz="UTC") + pd.to_timedelta(secs, unit=pd_unit)
+    return np.asarray(pd.DatetimeIndex(ts).strftime("%Y-%m-%dT%H:%M:%SZ"), dtype=object)
+
+def _read_pixels(nc, kind: str, fname: str, idx: dict, flat: np.ndarray, remove_negative: bool) -> dict:
+    """후보 픽셀의 위경도/값/구름/QA/시각 (창 하나만 읽음)"""
+    lat_v, lon_v, time_v = geolocation(nc)
+    win, r, c = pixel_window(idx, flat)
+    names = _names(nc)
+    main = pick_main_var(names, kind)
+    out = {"lat": _read(lat_v, win)[r, c], "lon": _read(lon_v, win)[r, c],
+           "value": _clean(_var(nc, main), win, r, c, remove_negative),
+           "units": getattr(_var(nc, main), "units", ""),
+           "time": _row_times(time_v, win, fname)[r]}
+    cf = pick_cloud_var(names, kind)
+    out["cloud_fraction"] = _clean(_var(nc, cf), win, r, c) if cf else np.full(flat.size, np.nan)
+    qa = pick_qa_var(names)
+    out["qa_value"] = _clean(_var(nc, qa), win, r, c) if qa else np.full(flat.size, np.nan)
+    return out
+
+# ===== 추출 =====
+def extract_bbox(path: str, kind: str, bbox=BBOX, qa_max=QA_MAX, cache_dir: Optional[str] = SWATH_CACHE_DIR):
+    """swath granule 하나 → BBOX 안 유효 픽셀 행 (time_utc, latitude, longitude, 값, cloud_fraction, units,
+    source_file, product_kind — L3 추출기와 같은 열). (DataFrame, 색인 출처)"""
+    spec, fname = PRODUCTS[kind], os.path.basename(path)
+    with netCDF4.Dataset(path) as nc:
+        idx, src = load_index(nc, fname, cache_dir)
+        flat = candidates(idx, bbox)
+        if not flat.size:
+            return pd.DataFrame(columns=["time_utc", "latitude", "longitude", spec["column"], "cloud_fraction",
+                                         "units", "source_file", "product_kind"]), src
+        px = _read_pixels(nc, kind, fname, idx, flat, REMOVE_NEGATIVE and spec["remove_negative"])
+    ok = np.isfinite(px["value"])
+    if bbox is not None:
+        lon_min, lat_min, lon_max, lat_max = bbox
+        ok &= (px["lat"] >= lat_min) & (px["lat"] <= lat_max) & (px["lon"] >= lon_min) & (px["lon"] <= lon_max)
+    if qa_max is not None:
+        ok &= px["qa_value"] <= qa_max
+    df = pd.DataFrame({"time_utc": px["time"][ok], "latitude": px["lat"][ok], "longitude": px["lon"][ok],
+                       spec["column"]: px["value"][ok], "cloud_fraction": px["cloud_fraction"][ok]})
+    df["units"] = px["units"]
+    df["source_file"] = fname
+    df["product_kind"] = kind
+    return df, src
+
+def extract_stations(path: str, kind: str, st: pd.DataFrame, max_dist_km: float = MAX_DIST_KM,
+                     qa_max=QA_MAX, cache_dir: Optional[str] = SWATH_CACHE_DIR,
+                     window_deg: float = WINDOW_DEG) -> pd.DataFrame:
+    """측정소별 가장 가까운 유효 swath 픽셀 (tempo_l3_stations.py와 같은 열, n_pixels=1)
+    측정소마다 자기 셀 + 거리 한도 안 이웃 셀의 픽셀만 후보. 타일별로 후보를 합쳐 덮는 창을 변수당 한 번 읽음"""
+    spec, fname = PRODUCTS[kind], os.path.basename(path)
+    lat, lon = st["lat"].to_numpy("f8"), st["lon"].to_numpy("f8")
+    tile = np.stack([np.floor(lat / window_deg), np.floor(lon / window_deg)], axis=1)
+    _, tile_id = np.unique(tile, axis=0, return_inverse=True)
+    tile_id = tile_id.ravel()
+    rows = {}
+    with netCDF4.Dataset(path) as nc:
+        idx, _ = load_index(nc, fname, cache_dir)
+        cands = station_candidates(idx, lat, lon, max_dist_km)
+        for t in np.unique(tile_id):
+            members = [i for i in np.flatnonzero(tile_id == t) if cands[i].size]
+            if not members:
+                continue
+            flat = np.unique(np.concatenate([cands[i] for i in members]))
+            px = _read_pixels(nc, kind, fname, idx, flat, REMOVE_NEGATIVE and spec["remove_negative"])
+            ok = np.isfinite(px["value"]) & np.isfinite(px["lat"])
+            if qa_max is not None:
+                ok &= px["qa_value"] <= qa_max
+            for i in members:
+                k = np.searchsorted(flat, cands[i])  # 이 측정소 후보의 창 안 위치
+                k = k[ok[k]]
+                if not k.size:
+                    continue
+                d = np.hypot(px["lat"][k] - lat[i], (px["lon"][k] - lon[i]) * np.cos(np.radians(lat[i]))) * KM_PER_DEG
+                j = int(np.argmin(d))
+                if d[j] > max_dist_km:
+                    continue
+                at = k[j]
+                rows[i] = {"station_id": st["id"].iat[i], "time_utc": px["time"][at], "product_kind": kind,
+                           "value": px["value"][at], "units": px["units"], "n_pixels": 1,
+                           "pixel_dist_km": round(float(d[j]), 3), "qa_value": px["qa_value"][at],
+                           "cloud_fraction": px["cloud_fraction"][at], "source_file": fname}
+    return pd.DataFrame([rows[i] for i in sorted(rows)])
+
+def main():
+    files = [p for p in sorted(glob(os.path.join(IN_DIR, "*.nc"))) if kind_from_filename(p, "L2") in KINDS]
+    if not files:
+        raise FileNotFoundError(f"L2 .nc 파일이 없습니다: {IN_DIR}")
+    st = None
+    if STATIONS_CSV:
+        from tempo_l3_stations import load_stations
+        st = load_stations(STATIONS_CSV)
+    rows, st_rows, srcs = [], [], {"mem": 0, "disk": 0, "built": 0}
+    t = time.perf_counter()
+    for p in files:
+        fname, kind = os.path.basename(p), kind_from_filename(p, "L2")
+        try:
+            df, src = extract_bbox(p, kind, BBOX, QA_MAX, SWATH_CACHE_DIR)
+            srcs[src] += 1
+            rows.append(df)
+            msg = f"[OK] {fname} rows={len(df):,} (색인: {src})"
+            if st is not None:
+                d = extract_stations(p, kind, st, MAX_DIST_KM, QA_MAX, SWATH_CACHE_DIR)
+                st_rows.append(d)
+                msg += f" stations={len(d):,}"
+            print(msg)
+        except Exception as e:
+            print(f"[SKIP] {fname} -> {e}")
+    print(f"▶ {time.perf_counter() - t:.1f}s, 색인 재사용 {srcs['mem'] + srcs['disk']} / 새로 만듦 {srcs['built']}")
+
+    if rows:
+        os.makedirs(os.path.dirname(OUT_CSV), exist_ok=True)
+        df = pd.concat(rows, ignore_index=True)
+        df.to_csv(OUT_CSV, index=False, encoding="utf-8")
+        print(f"▶ BBOX: {OUT_CSV} (rows={len(df):,})")
+    if st_rows:
+        df = pd.concat(st_rows, ignore_index=True)
+        df.to_csv(OUT_STATIONS_CSV, index=False, encoding="utf-8")
+        print(f"▶ 측정소: {OUT_STATIONS_CSV} (rows={len(df):,})")
+    print("\n✅ 완료")
+
+if __name__ == "__main__":
+    main()
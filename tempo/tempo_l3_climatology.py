@@ -0,0 +1,280 @@
+# tempo_l3_climatology.py
+# 픽셀별 · 지역시(local hour)별 기후값(climatology): 평균 / 중앙값 / p90 / 유효 개수 — NO2, HCHO
+# - granule을 하나씩 흘려보내며 픽셀 누적기에 더함 (전체 기간을 메모리에 올리지 않음)
+# - 모멘트: 개수 + 평균 + 편차제곱합(M2, Welford) → 병합은 Chan 공식
+# - 분위수: 로그 간격 구간 히스토그램 스케치(DDSketch 방식, 상대 오차 REL_ACCURACY) → 병합은 단순 덧셈
+#   (hour × 픽셀 × 구간 밀집 배열이라 BBOX 크기에 비례 — MAX_HIST_MB를 넘는 격자는 만들지 않음)
+# - 결과는 (hour, lat, lon) 작은 큐브(NetCDF4)로 저장 — 작업자 간 / 증분 실행 간 병합 가능
+#   (이미 포함된 granule은 source_file 목록으로 다시 더하지 않음)
+
+import os, time
+import numpy as np
+import pandas as pd
+import xarray as xr
+import netCDF4
+from glob import glob
+
+from tempo_l3_grid import load_grid, crop_to_grid, bbox_window, to_2d
+from tempo_l3_mask import clean_values
+from tempo_l3_precheck import PrecheckStats
+from tempo_l3_products import PRODUCTS, kind_from_filename, coverage_times, pick_main_var, pick_cloud_var
+
+# ===== 사용자 설정 =====
+IN_DIR   = r""                         # 제품이 섞여 있어도 됨 — 파일명으로 제품 구분
+OUT_DIR  = r""                         # 큐브 → OUT_DIR/clim_{kind}_{season}.nc (있으면 이어서 누적)
+KINDS    = ("no2", "hcho")
+BBOX     = (-74.3, 40.4, -73.6, 41.0)  # NYC (None이면 전체 격자)
+LOCAL_TIME = "solar"                   # "solar": 픽셀 경도 기준 지방 태양시 / 시간대 이름(예: "America/New_York")
+SEASONS  = {"DJF": (12, 1, 2), "MAM": (3, 4, 5), "JJA": (6, 7, 8), "SON": (9, 10, 11)}
+REMOVE_NEGATIVE = True
+CLOUD_MAX = None                       # 예: 0.2 → 구름 비율이 이보다 큰 픽셀 제외 (None이면 필터 없음)
+REL_ACCURACY = 0.02                    # 분위수 상대 오차
+VALUE_RANGE = {"no2": (1e13, 1e18), "hcho": (1e14, 1e18), "o3": (50.0, 800.0)}  # 구간 범위 (밖은 양 끝 구간)
+PRECHECK = True
+MAX_HIST_MB = 2048                     # 분위수 히스토그램 메모리 상한(MB). 넘으면 BBOX를 줄이거나 REL_ACCURACY를 키울 것
+MERGE_FROM = []                        # 작업자별 큐브 파일 목록을 주면 추출 대신 병합만 (OUT_DIR에 저장)
+
+class ClimCube:
+    """(local hour, lat, lon) 픽셀 누적기: 개수/평균/M2/최소/최대 + 로그 구간 분위수 스케치"""
+
+    def __init__(self, lat, lon, kind: str, season: str, origin=(0, 0), local_time: str = LOCAL_TIME,
+                 rel_accuracy: float = REL_ACCURACY, value_range=None, max_hist_mb: float = MAX_HIST_MB,
+                 sketch=None):
+        """value_range로 스케치 구간을 정함. sketch=(value_min, i0, nbins)를 주면 저장된 구간 그대로 (load)"""
+        self.lat, self.lon = np.asarray(lat, "f8"), np.asarray(lon, "f8")
+        self.kind, self.season, self.local_time = kind, season, local_time
+        self.origin = tuple(int(v) for v in origin)  # 원본 격자에서 창의 시작 인덱스
+        self.rel_accuracy = float(rel_accuracy)
+        self.gamma = (1 + self.rel_accuracy) / (1 - self.rel_accuracy)
+        if sketch is None:
+            vmin, vmax = value_range or VALUE_RANGE[kind]
+            if not 0 < vmin < vmax:
+                raise ValueError(f"VALUE_RANGE가 올바르지 않음: {(vmin, vmax)}")
+            self.vmin = float(vmin)
+            self.i0 = int(np.floor(np.log(vmin) / np.log(self.gamma)))
+            self.nbins = int(np.ceil(np.log(vmax) / np.log(self.gamma))) - self.i0 + 1
+        else:
+            self.vmin, self.i0, self.nbins = float(sketch[0]), int(sketch[1]), int(sketch[2])
+        shape = (24, self.lat.size, self.lon.size)
+        hist_mb = np.prod(shape, dtype="f8") * self.nbins * 4 / 1e6
+        if max_hist_mb is not None and hist_mb > max_hist_mb:
+            raise ValueError(f"분위수 히스토그램 {hist_mb:,.0f} MB > MAX_HIST_MB {max_hist_mb:,.0f} MB "
+                             f"(픽셀 {self.lat.size}×{self.lon.size}, 구간 {self.nbins}) — BBOX를 줄이거나 "
+                             f"REL_ACCURACY를 키우세요")
+        self.count = np.zeros(shape, "u4")
+        self.mean = np.zeros(shape, "f8")
+        self.m2 = np.zeros(shape, "f8")
+        self.min = np.full(shape, np.inf)
+        self.max = np.full(shape, -np.inf)
+        self.hist = np.zeros(shape + (self.nbins,), "u4")
+        self.sources = set()
+
+    # ----- 누적 -----
+    def _bin(self, x):
+        i = np.ceil(np.log(np.maximum(x, self.vmin)) / np.log(self.gamma)).astype("i8") - self.i0
+        return np.clip(i, 0, self.nbins - 1)
+
+    def add(self, values: np.ndarray, hours: np.ndarray, source: str):
+        """granule 하나의 (lat, lon) 값과 지역시(0~23) 배열을 더함. 픽셀당 한 값이므로 인덱스 중복 없음"""
+        iy, ix = np.nonzero(np.isfinite(values))
+        h, x = hours[iy, ix], values[iy, ix].astype("f8")
+        at = (h, iy, ix)
+        n = self.count[at] + 1
+        d = x - self.mean[at]
+        self.mean[at] += d / n
+        self.m2[at] += d * (x - self.mean[at])
+        self.count[at] = n
+        self.min[at] = np.minimum(self.min[at], x)
+        self.max[at] = np.maximum(self.max[at], x)
+        self.hist[at + (self._bin(x),)] += 1
+        self.sources.add(source)
+
+    def compatible(self, other) -> bool:
+        return (self.kind, self.season, self.local_time, self.origin, self.i0, self.nbins, self.rel_accuracy) == \
+               (other.kind, other.season, other.local_time, other.origin, other.i0, other.nbins, other.rel_accuracy) \
+               and np.array_equal(self.lat, other.lat) and np.array_equal(self.lon, other.lon)
+
+    def merge(self, other):
+        """다른 작업자/실행의 큐브를 합침 (같은 granule이 양쪽에 있으면 오류)"""
+        if not self.compatible(other):
+            raise ValueError(f"병합 불가: 설정/격자가 다른 큐브 ({other.kind}/{other.season})")
+        dup = self.sources & other.sources
+        if dup:
+            raise ValueError(f"같은 granule이 두 큐브에 모두 있음: {sorted(dup)[:3]} ...")
+        na, nb = self.count.astype("f8"), other.count.astype("f8")
+        n = na + nb
+        with np.errstate(invalid="ignore", divide="ignore"):
+            d = other.mean - self.mean
+            mean = np.where(n > 0, self.mean + d * nb / n, 0.0)
+            m2 = np.where(n > 0, self.m2 + other.m2 + d * d * na * nb / n, 0.0)
+        self.mean, self.m2 = mean, m2
+        self.count += other.count
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self.hist += other.hist
+        self.sources |= other.sources
+        return self
+
+    # ----- 통계 -----
+    def quantile(self, q: float) -> np.ndarray:
+        cum = np.cumsum(self.hist, axis=-1, dtype="u8")
+        rank = np.floor(q * (self.count.astype("f8") - 1))[..., None]
+        i = (cum > rank).argmax(axis=-1)
+        v = 2 * self.gamma ** (i + self.i0) / (self.gamma + 1)  # 구간 대표값 (상대 오차 ≤ REL_ACCURACY)
+        v = np.clip(v, self.min, self.max)
+        return np.where(self.count > 0, v, np.nan)
+
+    def stats(self) -> dict:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(self.count > 0, self.mean, np.nan)
+            std = np.where(self.count > 1, np.sqrt(self.m2 / (self.count - 1.0)), np.nan)
+        return {"count": self.count, "mean": mean, "std": std,
+                "median": self.quantile(0.5), "p90": self.quantile(0.9)}
+
+    def to_frame(self) -> pd.DataFrame:
+        """값이 있는 (hour, 픽셀)만 긴 형식으로"""
+        s = self.stats()
+        h, iy, ix = np.nonzero(self.count)
+        df = pd.DataFrame({"local_hour": h, "lat_idx": iy + self.origin[0], "lon_idx": ix + self.origin[1],
+                           "lat": self.lat[iy], "lon": self.lon[ix]})
+        for k in ("count", "mean", "std", "median", "p90"):
+            df[k] = s[k][h, iy, ix]
+        df.insert(0, "season", self.season)
+        df.insert(0, "product_kind", self.kind)
+        return df
+
+    # ----- 저장/읽기 -----
+    def save(self, path: str):
+        s = self.stats()
+        tmp = path + ".part"
+        with netCDF4.Dataset(tmp, "w", format="NETCDF4") as nc:
+            nc.setncatts({"product_kind": self.kind, "season": self.season, "local_time": self.local_time,
+                          "origin": np.array(self.origin, "i4"), "rel_accuracy": self.rel_accuracy,
+                          "sketch_i0": np.int32(self.i0), "sketch_nbins": np.int32(self.nbins),
+                          "value_min": self.vmin, "n_sources": np.int32(len(self.sources))})
+            for name, n in (("hour", 24), ("latitude", self.lat.size), ("longitude", self.lon.size),
+                            ("bin", self.nbins), ("source", len(self.sources))):
+                nc.createDimension(name, n)
+            nc.createVariable("hour", "i1", ("hour",))[:] = np.arange(24)
+            nc.createVariable("latitude", "f8", ("latitude",))[:] = self.lat
+            nc.createVariable("longitude", "f8", ("longitude",))[:] = self.lon
+            dims = ("hour", "latitude", "longitude")
+            for name, arr in (("count", self.count), ("mean_acc", self.mean), ("m2", self.m2),
+                              ("min", self.min), ("max", self.max)):
+                nc.createVariable(name, arr.dtype, dims, zlib=True)[:] = arr
+            for name in ("mean", "std", "median", "p90"):  # 조회용 (병합에는 쓰지 않음)
+                nc.createVariable(name, "f4", dims, zlib=True, fill_value=np.float32(np.nan))[:] = s[name]
+            nc.createVariable("hist", "u4", dims + ("bin",), zlib=True, shuffle=True,
+                              chunksizes=(1, self.lat.size, self.lon.size, self.nbins))[:] = self.hist
+            src = nc.createVariable("source_file", str, ("source",))
+            for i, f in enumerate(sorted(self.sources)):
+                src[i] = f
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str):
+        with netCDF4.Dataset(path) as nc:
+            a = {k: nc.getncattr(k) for k in nc.ncattrs()}
+            cube = cls(nc["latitude"][:], nc["longitude"][:], a["product_kind"], a["season"],
+                       origin=tuple(a["origin"]), local_time=a["local_time"], rel_accuracy=a["rel_accuracy"],
+                       sketch=(a["value_min"], a["sketch_i0"], a["sketch_nbins"]))
+            cube.count, cube.mean, cube.m2 = nc["count"][:].data, nc["mean_acc"][:].data, nc["m2"][:].data
+            cube.min, cube.max, cube.hist = nc["min"][:].data, nc["max"][:].data, nc["hist"][:].data
+            cube.sources = set(nc["source_file"][:]) if len(nc.dimensions["source"]) else set()
+        return cube
+
+def season_of(ts: pd.Timestamp) -> str:
+    return next(s for s, months in SEASONS.items() if ts.month in months)
+
+def local_hours(tm: pd.Timestamp, lat: np.ndarray, lon: np.ndarray, local_time: str = LOCAL_TIME) -> np.ndarray:
+    """(lat, lon) 지역시 정수 배열. solar면 경도 15°당 1시간"""
+    if local_time == "solar":
+        utc_h = tm.hour + tm.minute / 60 + tm.second / 3600
+        col = np.floor((utc_h + lon / 15.0) % 24).astype("i8")
+    else:
+        col = np.full(lon.size, tm.tz_convert(local_time).hour, dtype="i8")
+    return np.broadcast_to(col, (lat.size, lon.size))
+
+def read_values(path: str, kind: str, grid: dict) -> np.ndarray:
+    spec = PRODUCTS[kind]
+    prod = xr.open_dataset(path, group="product", engine="netcdf4", decode_cf=True, mask_and_scale=False)
+    try:
+        da = clean_values(crop_to_grid(prod[pick_main_var(prod, kind)], grid, BBOX),
+                          remove_negative=REMOVE_NEGATIVE and spec["remove_negative"])
+        arr = to_2d(da, grid)
+        if CLOUD_MAX is not None:
+            cf_name = pick_cloud_var(prod, kind)
+            if cf_name is not None:
+                cf = to_2d(clean_values(crop_to_grid(prod[cf_name], grid, BBOX)), grid)
+                arr = np.where(cf <= CLOUD_MAX, arr, np.nan)  # 구름 비율이 없는(NaN) 픽셀도 제외
+    finally:
+        prod.close()
+    return arr
+
+def merge_files(paths, out_dir: str = OUT_DIR) -> list:
+    """작업자별 큐브 파일 → (kind, season)별로 병합해 out_dir에 저장"""
+    merged = {}
+    for p in paths:
+        c = ClimCube.load(p)
+        key = (c.kind, c.season)
+        merged[key] = merged[key].merge(c) if key in merged else c
+    outs = []
+    for (kind, season), c in sorted(merged.items()):
+        out = os.path.join(out_dir, f"clim_{kind}_{season}.nc")
+        c.save(out)
+        outs.append(out)
+        print(f"[OK] {os.path.basename(out)} ← granule {len(c.sources):,}개")
+    return outs
+
+def main():
+    os.makedirs(OUT_DIR, exist_ok=True)
+    if MERGE_FROM:
+        merge_files(MERGE_FROM, OUT_DIR)
+        return
+    files = [p for p in sorted(glob(os.path.join(IN_DIR, "*.nc"))) if kind_from_filename(p) in KINDS]
+    if not files:
+        raise FileNotFoundError(f".nc 파일이 없습니다: {IN_DIR}")
+
+    cubes, added = {}, 0
+    stats = PrecheckStats()
+    for p in files:
+        fname, kind = os.path.basename(p), kind_from_filename(p)
+        try:
+            with netCDF4.Dataset(p) as nc:
+                _, _, tm = coverage_times({k: nc.getncattr(k) for k in nc.ncattrs()}, fname)
+            season = season_of(tm)
+            grid = load_grid(p)
+            ys, xs = bbox_window(grid, BBOX)
+            key = (kind, season)
+            if key not in cubes:
+                out = os.path.join(OUT_DIR, f"clim_{kind}_{season}.nc")
+                cubes[key] = ClimCube.load(out) if os.path.exists(out) else ClimCube(
+                    grid["lat"][ys], grid["lon"][xs], kind, season,
+                    origin=(grid["origin"][0] + (ys.start or 0), grid["origin"][1] + (xs.start or 0)))
+            cube = cubes[key]
+            if fname in cube.sources:
+                continue  # 이전 실행에서 이미 누적
+            if PRECHECK:
+                ok, why = stats.check(p, kind, BBOX)
+                if not ok:
+                    print(f"[SKIP] {fname} -> 사전 점검: {why}")
+                    continue
+            t = time.perf_counter()
+            cube.add(read_values(p, kind, grid), local_hours(tm, cube.lat, cube.lon), fname)
+            stats.record_extract(time.perf_counter() - t)
+            added += 1
+            print(f"[OK] {fname} → {kind}/{season}")
+        except Exception as e:
+            print(f"[SKIP] {fname} -> {e}")
+    if PRECHECK:
+        print(stats.summary())
+
+    for (kind, season), c in sorted(cubes.items()):
+        out = os.path.join(OUT_DIR, f"clim_{kind}_{season}.nc")
+        c.save(out)
+        n_cells = int((c.count > 0).sum())
+        print(f"▶ {os.path.basename(out)}: granule {len(c.sources):,}개, (hour, 픽셀) {n_cells:,}개")
+    print(f"\n✅ 완료: 새 granule {added}개 누적 → {OUT_DIR}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# tempo_l3_crop_ingest.py
+# 수집 직후 크롭(crop-on-ingest): CONUS granule → 영역 창 + 필요한 변수만 담은 작은 NetCDF4
+# - 출력은 원본과 같은 구조/이름(root 위경도 + product 그룹, 같은 파일명) → 기존 추출 스크립트가 그대로 읽음
+#   (IN_DIR만 OUT_DIR/<영역> 으로 바꾸면 됨)
+# - 변수: 메인 + 구름 + 보조(정밀도/QA/기하 등 키워드) 변수만, 원시(packed) 값 그대로 복사 → 값 손실 없음
+# - 전역 속성 유지(geospatial_* 범위는 크롭 창으로 갱신) + 출처(provenance) 속성 추가, 압축(zlib+shuffle)
+# - 성공하면 원본은 삭제/보관 폴더로 이동/유지 중 선택
+
+import os, shutil
+import numpy as np
+import pandas as pd
+import netCDF4
+from glob import glob
+
+from tempo_l3_grid import load_grid, bbox_window
+from tempo_l3_products import kind_from_filename, pick_main_var, pick_extra_vars
+from tempo_catalog import file_hash
+
+# ===== 사용자 설정 =====
+IN_DIR   = r""                                 # 받은 CONUS granule 폴더
+OUT_DIR  = r""                                 # 크롭 결과 → OUT_DIR/<영역>/<원본 파일명>
+REGIONS  = {"nyc": (-74.3, 40.4, -73.6, 41.0)}
+ORIGINAL_ACTION = "archive"                    # "delete" / "archive" / "keep"
+ARCHIVE_DIR = r""                              # ORIGINAL_ACTION="archive"일 때 원본 이동 폴더
+COMPLEVEL = 4
+# 메인/구름/제품별 보조 변수(pick_extra_vars) 외에 함께 남길 변수(이름에 포함된 키워드, 모든 그룹 대상)
+EXTRA_KEYWORDS = ("precision", "uncertainty", "qa", "quality", "cloud", "zenith",
+                  "air_mass_factor", "amf")
+
+def resolve_vars(src: netCDF4.Dataset, kind: str) -> dict:
+    """그룹별로 남길 격자 변수 이름 {그룹: [이름]}"""
+    keep = {}
+    for gname, grp in src.groups.items():
+        names = [vn for vn, v in grp.variables.items()
+                 if v.dtype != str and any(k in vn.lower() for k in EXTRA_KEYWORDS)]
+        if gname == "product" and kind:
+            # 별칭으로 찾는 보조 변수(ocp, sza, vza 등)도 추출 스크립트와 같은 규칙으로 남김
+            names = [pick_main_var(grp, kind), *pick_extra_vars(grp, kind).values(), *names]
+        names = list(dict.fromkeys(names))
+        if names:
+            keep[gname] = names
+    return keep
+
+def _copy_var(var, dst_grp, dims_idx: dict, complevel: int):
+    idx = tuple(dims_idx.get(d, slice(None)) for d in var.dimensions)
+    attrs = {k: var.getncattr(k) for k in var.ncattrs()}
+    fill = attrs.pop("_FillValue", None)
+    out = dst_grp.createVariable(var.name, var.dtype, var.dimensions, zlib=True, complevel=complevel,
+                                 shuffle=True, fill_value=fill)
+    out.setncatts(attrs)
+    out.set_auto_maskandscale(False)  # 원시 값 그대로 (다시 packing하지 않도록)
+    out[...] = var[idx]
+
+def crop_granule(path: str, regions: dict = REGIONS, out_dir: str = OUT_DIR,
+                 complevel: int = COMPLEVEL) -> list:
+    """granule 하나 → 영역별 크롭 파일 경로 목록 (BBOX와 겹치지 않는 영역은 건너뜀)"""
+    fname = os.path.basename(path)
+    kind = kind_from_filename(fname)
+    grid = load_grid(path)
+    provenance = {
+        "crop_source_file": fname,
+        "crop_source_size": np.int64(os.path.getsize(path)),
+        "crop_source_hash": file_hash(path, "quick"),
+        "crop_created_utc": pd.Timestamp.now(tz="UTC").strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "crop_tool": "tempo_l3_crop_ingest.py",
+    }
+    outs = []
+    with netCDF4.Dataset(path) as src:
+        src.set_auto_maskandscale(False)
+        lat_dim = src.variables[grid["lat_name"]].dimensions[0]
+        lon_dim = src.variables[grid["lon_name"]].dimensions[0]
+        keep = resolve_vars(src, kind)
+        for region, bbox in regions.items():
+            ys, xs = bbox_window(grid, bbox)
+            ny, nx = len(range(*ys.indices(grid["lat"].size))), len(range(*xs.indices(grid["lon"].size)))
+            if ny == 0 or nx == 0:
+                continue
+            dims_idx = {lat_dim: ys, lon_dim: xs}
+            dst_path = os.path.join(out_dir, region, fname)
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            tmp = dst_path + ".part"
+            with netCDF4.Dataset(tmp, "w", format="NETCDF4") as dst:
+                dst.setncatts({k: src.getncattr(k) for k in src.ncattrs()})
+                dst.setncatts({**provenance, "crop_region": region,
+                               "crop_bbox": np.array(bbox, dtype="f8"),
+                               "crop_window": np.array([ys.start or 0, (ys.start or 0) + ny,
+                                                        xs.start or 0, (xs.start or 0) + nx], dtype="i4")})
+                # 범위 속성은 크롭 창 기준으로 (tempo_catalog/tempo_l3_precheck가 footprint로 읽음)
+                lat_c, lon_c = grid["lat"][ys], grid["lon"][xs]
+                dst.setncatts({"geospatial_lat_min": float(lat_c.min()), "geospatial_lat_max": float(lat_c.max()),
+                               "geospatial_lon_min": float(lon_c.min()), "geospatial_lon_max": float(lon_c.max())})
+                for name, dim in src.dimensions.items():
+                    n = {lat_dim: ny, lon_dim: nx}.get(name, len(dim))
+                    dst.createDimension(name, None if dim.isunlimited() else n)
+                # root: 좌표 및 root 차원만 쓰는 변수(크롭해도 작음)
+                for var in src.variables.values():
+                    if var.dtype != str and set(var.dimensions) <= set(src.dimensions):
+                        _copy_var(var, dst, dims_idx, complevel)
+                for gname, names in keep.items():
+                    g = dst.createGroup(gname)
+                    sg = src.groups[gname]
+                    g.setncatts({k: sg.getncattr(k) for k in sg.ncattrs()})
+                    for vn in names:
+                        _copy_var(sg.variables[vn], g, dims_idx, complevel)
+            os.replace(tmp, dst_path)
+            outs.append(dst_path)
+    return outs
+
+def dispose_original(path: str, action: str = ORIGINAL_ACTION, archive_dir: str = ARCHIVE_DIR):
+    if action == "delete":
+        os.remove(path)
+    elif action == "archive":
+        if not archive_dir:
+            raise ValueError("ORIGINAL_ACTION='archive'에는 ARCHIVE_DIR가 필요합니다.")
+        os.makedirs(archive_dir, exist_ok=True)
+        shutil.move(path, os.path.join(archive_dir, os.path.basename(path)))
+
+def crop_files(paths, regions: dict = REGIONS, out_dir: str = OUT_DIR,
+               action: str = ORIGINAL_ACTION, archive_dir: str = ARCHIVE_DIR) -> list:
+    """여러 granule 크롭. 크롭 파일 경로 목록 반환 (실패한 원본은 그대로 둠)"""
+    outs, before, after = [], 0, 0
+    for p in paths:
+        try:
+            size = os.path.getsize(p)
+            made = crop_granule(p, regions, out_dir)
+            if made:  # 겹치는 영역이 하나도 없으면 원본을 그대로 둠
+                dispose_original(p, action, archive_dir)
+            before += size
+            after += sum(os.path.getsize(o) for o in made)
+            outs.extend(made)
+            print(f"[OK] {os.path.basename(p)} → {len(made)}개 영역")
+        except Exception as e:
+            print(f"[SKIP] {os.path.basename(p)} -> {e}")
+    if before:
+        print(f"▶ 크롭: {before / 1e6:,.1f} MB → {after / 1e6:,.1f} MB ({after / before:.1%})")
+    return outs
+
+def main():
+    files = sorted(glob(os.path.join(IN_DIR, "*.nc")))
+    if not files:
+        raise FileNotFoundError(f".nc 파일이 없습니다: {IN_DIR}")
+    outs = crop_files(files)
+    print(f"\n✅ 완료: {len(outs)}개 파일 → {OUT_DIR}")
+
+if __name__ == "__main__":
+    main()
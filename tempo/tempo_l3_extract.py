@@ -0,0 +1,221 @@
+# tempo_l3_extract.py
+# TEMPO L3 추출 엔진 (NO2 / O3 / HCHO 공통) — granule 하나를 한 번 열고 한 번 잘라 긴 형식 표로
+# - 변수 선택은 tempo_l3_products 규칙(메인 / 구름 / 제품별 보조 / QA), 창 읽기는 read_cropped 한 번
+# - 시각 부여는 교체 가능한 정책(TIME_POLICIES). 여러 정책을 주면 같은 패스에서 열만 늘어남
+#     "filename" : 파일명 시각                              → time_utc (%Y-%m-%dT%H:%M:%SZ)
+#     "coverage" : time_coverage_*_since_epoch 시작/끝/중간  → time_start_utc, time_end_utc, time_mid_utc
+#                  (없으면 ISO 속성 → root time 변수 → 파일명)
+#     "pixel"    : product에 (위도, 경도) 차원의 시각 변수가 있으면 픽셀별 값 → time_pixel_utc (없으면 빈 값)
+#   정책은 g(granule 문맥 dict) → {열 이름: 스칼라 또는 창 DataArray} 함수 — 이름 대신 함수를 직접 넘겨도 됨
+# - tempo_{no2,o3,hcho}_l3_to_csv.py / _nyc_time.py 는 정책 + 열 배치만 고르는 얇은 래퍼
+# - extract_rows: NRT 폴링 / 백필 / Arrow 저장이 공유하는 고정 열 긴 형식 (ROW_COLUMNS)
+
+import os, time
+import numpy as np
+import pandas as pd
+import xarray as xr
+import netCDF4
+from glob import glob
+
+from tempo_l3_grid import load_grid, crop_to_grid, dim_mapping
+from tempo_l3_mask import clean_values
+from tempo_l3_parallel_read import read_cropped, READ_WORKERS
+from tempo_l3_precheck import PrecheckStats
+from tempo_l3_products import (PRODUCTS, kind_from_filename, time_from_filename, coverage_times,
+                               pick_main_var, pick_extra_vars)
+
+# ===== 사용자 설정 (단독 실행: 폴더의 granule → 제품별 CSV, 시각 정책 여러 개를 한 패스에) =====
+IN_DIR   = r""
+OUT_DIR  = r""
+KINDS    = ("no2", "o3", "hcho")
+BBOX     = (-74.3, 40.4, -73.6, 41.0)  # NYC
+POLICIES = ("coverage", "filename", "pixel")
+REMOVE_NEGATIVE = True                 # NO2/HCHO만 적용 (PRODUCTS[...]["remove_negative"])
+
+PRECHECK = True               # 속성/야간 사전 점검으로 쓸 데이터 없는 granule 건너뛰기 (유효 픽셀 0은 추출기가 메인 창만 읽고 건너뜀)
+PRECHECK_READ_WINDOW = False  # True면 사전 점검에서도 메인 변수 창을 읽음 (통과한 granule은 같은 창을 두 번 읽게 됨)
+
+ISO_S  = "%Y-%m-%dT%H:%M:%SZ"
+ISO_US = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+# ===== 시각 정책 =====
+def filename_time(g: dict) -> dict:
+    return {"time_utc": time_from_filename(g["fname"]).strftime(ISO_S)}
+
+def _root_time(nc):
+    # 커버리지 속성이 없는 파일: root time 변수의 첫 값
+    v = nc.variables.get("time")
+    if v is None or not hasattr(v, "units"):
+        return None
+    t = netCDF4.num2date(np.ravel(v[:])[0], v.units,
+                         only_use_cftime_datetimes=False, only_use_python_datetimes=True)
+    return pd.Timestamp(t).tz_localize("UTC")
+
+def coverage_time(g: dict) -> dict:
+    with netCDF4.Dataset(g["path"]) as nc:
+        attrs = {k: nc.getncattr(k) for k in nc.ncattrs()}
+        t = None
+        if not any(k in attrs for k in ("time_coverage_start_since_epoch", "time_coverage_start")):
+            t = _root_time(nc)
+    t0, t1, tm = (t, t, t) if t is not None else coverage_times(attrs, g["fname"])
+    return {"time_start_utc": t0.strftime(ISO_US), "time_end_utc": t1.strftime(ISO_US),
+            "time_mid_utc": tm.strftime(ISO_US)}
+
+def pixel_time(g: dict) -> dict:
+    prod, grid = g["prod"], g["grid"]
+    if g["empty"]:
+        return {"time_pixel_utc": None}  # 유효 픽셀 0 — 시각 변수 창은 읽지 않음
+    spatial = {grid["lat_name"], grid["lon_name"]}
+    for v in prod.data_vars:
+        da = prod[v]
+        if np.issubdtype(da.dtype, np.datetime64) and spatial <= set(dim_mapping(grid, da).values()):
+            return {"time_pixel_utc": crop_to_grid(da, grid, g["bbox"]).load()}
+    return {"time_pixel_utc": None}
+
+TIME_POLICIES = {"filename": filename_time, "coverage": coverage_time, "pixel": pixel_time}
+
+# ===== 추출 =====
+def _wanted(columns, rename: dict) -> set:
+    # 출력 열 이름 → 엔진 열 이름 (rename 역매핑)
+    inv = {v: k for k, v in rename.items()}
+    return {inv.get(c, c) for c in columns}
+
+def _arrange(df: pd.DataFrame, columns, rename: dict, lat_name: str, lon_name: str) -> pd.DataFrame:
+    # rename 대상과 같은 이름의 기존 열(L3 보조 차원 'time' 등)은 버리고 이름 교체 → 있는 열만 순서대로
+    # 열 목록의 "lat"/"lon"은 격자의 위경도 이름
+    df = df.drop(columns=[c for c in rename.values() if c in df.columns and c not in rename])
+    df = df.rename(columns=rename)
+    alias = {"lat": lat_name, "lon": lon_name}
+    return df[[alias.get(c, c) for c in columns if alias.get(c, c) in df.columns]]
+
+def extract_granule(path: str, kind: str, bbox=BBOX, policies=("filename",), columns=None, rename=None,
+                    clean: bool = True, remove_negative: bool = REMOVE_NEGATIVE,
+                    read_workers: int = READ_WORKERS) -> pd.DataFrame:
+    """granule 하나 → BBOX 긴 형식 표
+    - 기본 열: <정책 열들>, 위도, 경도, <제품 값>, cloud_fraction, <제품별 보조>, qa_value, <기타 차원>,
+      units, source_file, product_kind
+    - columns: 이 열만 이 순서로 (rename 적용 후 이름, "lat"/"lon", "<열>_units"는 그 변수의 units)
+      → 목록에 없는 보조 변수는 읽지 않음
+    - 메인 창부터 읽어 유효 픽셀이 0이면 구름/QA/보조 변수는 읽지 않고 빈 표(같은 열) 반환
+    - 원시(packed) 값으로 열고 공용 커널(clean_values)이 디코드+마스킹을 한 번에:
+      clean=False면 fill→NaN, scale/offset만 (CF 디코드와 같은 값), True면 유효범위/음수까지 정리"""
+    spec, col = PRODUCTS[kind], PRODUCTS[kind]["column"]
+    fname, rename = os.path.basename(path), rename or {}
+    grid = load_grid(path)
+    lat_name, lon_name = grid["lat_name"], grid["lon_name"]
+
+    prod = xr.open_dataset(path, group="product", engine="netcdf4", decode_cf=True, mask_and_scale=False)
+    try:
+        main = pick_main_var(prod, kind)
+        extras = pick_extra_vars(prod, kind)
+        if columns is not None:
+            wanted = _wanted(columns, rename)
+            extras = {c: v for c, v in extras.items() if c in wanted or f"{c}_units" in wanted}
+        def cleaned(c, da):
+            return clean_values(da, remove_negative=clean and c == col and remove_negative
+                                and spec["remove_negative"], valid_range=clean)
+
+        # 메인 창만 먼저: 유효 픽셀이 없으면(전운량/미관측) 나머지 변수는 열지 않음
+        arrays = {col: cleaned(col, read_cropped(path, prod, [main], grid, bbox, read_workers)[main])}
+        empty = not np.isfinite(arrays[col].values).any()
+        if empty:
+            # 열 구성만 맞춤 (값은 어차피 dropna로 모두 빠짐)
+            arrays.update({c: arrays[col].copy(data=np.full(arrays[col].shape, np.nan))
+                              .assign_attrs(units=prod[v].attrs.get("units", "")) for c, v in extras.items()})
+        else:
+            # 보조 변수 창을 한 번에 (HDF5 호출은 이 스레드, 압축 해제만 작업 스레드에서 병렬)
+            loaded = read_cropped(path, prod, list(extras.values()), grid, bbox, read_workers)
+            arrays.update({c: cleaned(c, loaded[v]) for c, v in extras.items()})
+
+        g = {"path": path, "fname": fname, "kind": kind, "prod": prod, "grid": grid, "bbox": bbox, "empty": empty}
+        stamps = {}
+        for p in policies:
+            stamps.update((TIME_POLICIES[p] if isinstance(p, str) else p)(g))
+        pixel = {c: v for c, v in stamps.items() if isinstance(v, xr.DataArray)}
+
+        # 같은 창의 변수들을 Dataset 하나로 → 표 변환 한 번 (보조 변수 병합 불필요)
+        df = xr.Dataset({**arrays, **pixel}).to_dataframe().reset_index().dropna(subset=[col])
+    finally:
+        prod.close()
+
+    for c, v in stamps.items():
+        if c in pixel:
+            df[c] = pd.to_datetime(df[c], utc=True).dt.strftime(ISO_US)
+        else:
+            df[c] = v
+    df["units"] = arrays[col].attrs.get("units", "")
+    for c, da in arrays.items():
+        if columns is not None and f"{c}_units" in _wanted(columns, rename) and da.attrs.get("units"):
+            df[f"{c}_units"] = da.attrs["units"]
+    df["source_file"] = fname
+    df["product_kind"] = kind
+
+    head = list(stamps) + [lat_name, lon_name] + list(arrays)
+    tail = ["units", "source_file", "product_kind"]
+    df = df[head + [c for c in df.columns if c not in head + tail] + tail]
+    if columns is None:
+        return df
+    return _arrange(df, columns, rename, lat_name, lon_name)
+
+def row_columns(kind: str) -> list:
+    """extract_rows 열 순서 ("lat"/"lon"은 격자의 위경도 이름으로 나옴)"""
+    return ["time_utc", "lat", "lon", PRODUCTS[kind]["column"], "cloud_fraction", "units", "source_file", "product_kind"]
+
+def extract_rows(path: str, kind: str, bbox=BBOX, remove_negative: bool = REMOVE_NEGATIVE) -> pd.DataFrame:
+    """granule 하나 → 공용 긴 형식 행 (time_utc, 위도, 경도, 값, cloud_fraction, units, source_file, product_kind)"""
+    return extract_granule(path, kind, bbox, ("filename",), row_columns(kind), remove_negative=remove_negative)
+
+def list_files(in_dir: str, kind: str, catalog_db: str = "", catalog_time=(None, None),
+               catalog_region=None) -> list:
+    """제품의 granule 목록 (카탈로그가 있으면 인덱스 질의, 없으면 폴더 스캔 — 다른 제품 파일은 제외)"""
+    if catalog_db:
+        from tempo_catalog import select_paths
+        return select_paths(catalog_db, kind, start=catalog_time[0], end=catalog_time[1], region=catalog_region)
+    return [p for p in sorted(glob(os.path.join(in_dir, "*.nc"))) if kind_from_filename(p) in (kind, None)]
+
+def extract_files(files, kind: str, bbox=BBOX, policies=("filename",), columns=None, rename=None,
+                  clean: bool = True, remove_negative: bool = REMOVE_NEGATIVE,
+                  read_workers: int = READ_WORKERS, precheck: bool = False,
+                  precheck_read_window: bool = PRECHECK_READ_WINDOW) -> list:
+    """granule별 extract_granule 결과 목록 (실패한 granule은 [SKIP] 후 계속)"""
+    out, stats = [], PrecheckStats()
+    for p in files:
+        fname = os.path.basename(p)
+        if precheck:
+            ok, why = stats.check(p, kind, bbox, precheck_read_window)
+            if not ok:
+                print(f"[SKIP] {fname} -> 사전 점검: {why}")
+                continue
+        try:
+            t = time.perf_counter()
+            df = extract_granule(p, kind, bbox, policies, columns, rename, clean, remove_negative, read_workers)
+            if not len(df):
+                stats.record_empty(time.perf_counter() - t)
+                print(f"[SKIP] {fname} -> BBOX 유효 픽셀 0")
+                continue
+            stats.record_extract(time.perf_counter() - t)
+            out.append(df)
+            print(f"[OK] {fname}")
+        except Exception as e:
+            print(f"[SKIP] {fname} -> {e}")
+    if precheck:
+        print(stats.summary())
+    return out
+
+def main():
+    os.makedirs(OUT_DIR, exist_ok=True)
+    for kind in KINDS:
+        files = list_files(IN_DIR, kind)
+        if not files:
+            continue
+        parts = extract_files(files, kind, BBOX, POLICIES, remove_negative=REMOVE_NEGATIVE,
+                              precheck=PRECHECK, precheck_read_window=PRECHECK_READ_WINDOW)
+        if parts:
+            out = pd.concat(parts, ignore_index=True)
+            out_csv = os.path.join(OUT_DIR, f"{kind}_L3_NYC.csv")
+            out.to_csv(out_csv, index=False, encoding="utf-8")
+            print(f"▶ {kind}: {out_csv} (rows={len(out):,}, files={len(parts)}/{len(files)})")
+    print("\n✅ 완료")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# tempo_l3_grid.py
+# TEMPO L3 V03 격자 기하(geometry) 캐시
+# - L3 V03 granule은 모두 같은 고정 격자를 공유 → 위경도 벡터 / BBOX 인덱스 창 / 차원 매핑을 한 번만 계산
+# - 지문(fingerprint) = 좌표 배열의 shape + 첫/끝 값 + 간격 (좌표마다 값 3개만 읽음)
+# - 지문이 일치하면 메모리 → 디스크(npz) 캐시에서 꺼내 쓰므로 granule마다 좌표 I/O 없음
+# - 크롭 파일(tempo_l3_crop_ingest.py)은 원본 격자에서의 시작 인덱스를 origin으로 기록 → 정수 인덱스는 원본 기준
+
+import os, json, hashlib
+import numpy as np
+import netCDF4
+from typing import Optional, Dict
+
+# ===== 사용자 설정 =====
+GRID_CACHE_DIR = os.environ.get(
+    "TEMPO_GRID_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "tempo_l3_grid")
+)  # None이면 메모리 캐시만 사용
+
+LAT_CANDS = ["latitude", "lat"]
+LON_CANDS = ["longitude", "lon"]
+
+_MEM: Dict[str, dict] = {}  # fingerprint -> grid
+
+def _pick_coord(nc, cands):
+    return next((c for c in cands if c in nc.variables), None)
+
+def _coord_signature(var) -> str:
+    # 전체 배열 대신 첫 두 값 + 마지막 값만 읽음
+    n = var.shape[0]
+    head = np.ma.getdata(var[0:2]).astype("f8")
+    last = float(np.ma.getdata(var[n - 1]))
+    step = float(head[1] - head[0]) if n > 1 else 0.0
+    return f"{n}:{head[0]:.6f}:{last:.6f}:{step:.8f}"
+
+def read_fingerprint(nc: netCDF4.Dataset):
+    """열린 root 그룹에서 (지문, lat 이름, lon 이름) 반환"""
+    lat_name = _pick_coord(nc, LAT_CANDS)
+    lon_name = _pick_coord(nc, LON_CANDS)
+    if lat_name is None or lon_name is None:
+        raise RuntimeError(f"위경도 좌표 없음: {list(nc.variables)}")
+    lat_v, lon_v = nc.variables[lat_name], nc.variables[lon_name]
+    if lat_v.ndim != 1 or lon_v.ndim != 1:
+        raise RuntimeError(f"1차원 L3 격자가 아님: {lat_name}{lat_v.shape}, {lon_name}{lon_v.shape}")
+    sig = f"{lat_name}={_coord_signature(lat_v)}|{lon_name}={_coord_signature(lon_v)}"
+    return hashlib.sha1(sig.encode()).hexdigest()[:16], lat_name, lon_name
+
+# ----- 디스크 캐시 -----
+def _cache_path(cache_dir, fp):
+    return os.path.join(cache_dir, f"grid_{fp}.npz")
+
+def _load_disk(fp, cache_dir) -> Optional[dict]:
+    if not cache_dir:
+        return None
+    path = _cache_path(cache_dir, fp)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as z:
+            meta = json.loads(str(z["meta"]))
+            lat, lon = z["lat"], z["lon"]
+    except Exception:
+        return None  # 손상된 캐시는 무시하고 다시 계산
+    return {"fingerprint": fp, "lat_name": meta["lat_name"], "lon_name": meta["lon_name"],
+            "lat": lat, "lon": lon, "windows": meta.get("windows", {}),
+            "dim_maps": meta.get("dim_maps", {}), "origin": tuple(meta.get("origin", (0, 0)))}
+
+def _save_disk(grid, cache_dir):
+    if not cache_dir:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    meta = {k: grid[k] for k in ("lat_name", "lon_name", "windows", "dim_maps", "origin")}
+    path = _cache_path(cache_dir, grid["fingerprint"])
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, lat=grid["lat"], lon=grid["lon"], meta=np.array(json.dumps(meta)))
+    os.replace(tmp, path)  # 동시 실행 프로세스가 반쯤 쓴 파일을 읽지 않도록
+
+# ----- 공개 API -----
+def load_grid(nc_path: str, cache_dir: Optional[str] = GRID_CACHE_DIR) -> dict:
+    """granule의 격자 기하. 지문이 캐시에 있으면 좌표 전체를 읽지 않음"""
+    with netCDF4.Dataset(nc_path) as nc:
+        fp, lat_name, lon_name = read_fingerprint(nc)
+        grid = _MEM.get(fp)
+        if grid is not None:
+            return grid
+        grid = _load_disk(fp, cache_dir)
+        if grid is None:
+            crop = nc.getncattr("crop_window") if "crop_window" in nc.ncattrs() else (0, 0, 0, 0)
+            grid = {
+                "fingerprint": fp, "lat_name": lat_name, "lon_name": lon_name,
+                "lat": np.ma.getdata(nc.variables[lat_name][:]),
+                "lon": np.ma.getdata(nc.variables[lon_name][:]),
+                "windows": {}, "dim_maps": {}, "origin": (int(crop[0]), int(crop[2])),
+            }
+            _save_disk(grid, cache_dir)
+    _MEM[fp] = grid
+    return grid
+
+def bbox_window(grid: dict, bbox, cache_dir: Optional[str] = GRID_CACHE_DIR):
+    """BBOX → (lat slice, lon slice). 격자·BBOX당 한 번만 계산. 겹침이 없으면 빈 slice"""
+    if bbox is None:
+        return slice(None), slice(None)
+    key = ",".join(f"{float(v):.6f}" for v in bbox)
+    win = grid["windows"].get(key)
+    if win is None:
+        lon_min, lat_min, lon_max, lat_max = bbox
+        iy = np.nonzero((grid["lat"] >= lat_min) & (grid["lat"] <= lat_max))[0]
+        ix = np.nonzero((grid["lon"] >= lon_min) & (grid["lon"] <= lon_max))[0]
+        if iy.size == 0 or ix.size == 0:
+            win = [0, 0, 0, 0]
+        else:
+            win = [int(iy[0]), int(iy[-1]) + 1, int(ix[0]), int(ix[-1]) + 1]
+        grid["windows"][key] = win
+        _save_disk(grid, cache_dir)
+    return slice(win[0], win[1]), slice(win[2], win[3])
+
+def dim_mapping(grid: dict, da, cache_dir: Optional[str] = GRID_CACHE_DIR) -> dict:
+    """변수 차원(y/x 등) → lat/lon 이름 매핑. 차원 시그니처별로 한 번만 계산"""
+    key = "|".join(f"{d}:{da.sizes[d]}" for d in da.dims)
+    mapping = grid["dim_maps"].get(key)
+    if mapping is None:
+        mapping = {}
+        for d in da.dims:
+            if da.sizes[d] == grid["lat"].size:
+                mapping[d] = grid["lat_name"]
+            elif da.sizes[d] == grid["lon"].size:
+                mapping[d] = grid["lon_name"]
+        grid["dim_maps"][key] = mapping
+        _save_disk(grid, cache_dir)
+    return mapping
+
+def crop_to_grid(da, grid: dict, bbox, cache_dir: Optional[str] = GRID_CACHE_DIR):
+    """차원 매핑 → BBOX 창만 isel(지연 로딩이면 창만 읽음) → 캐시된 위경도 좌표 주입"""
+    lat_name, lon_name = grid["lat_name"], grid["lon_name"]
+    mapping = {k: v for k, v in dim_mapping(grid, da, cache_dir).items() if k != v}
+    if mapping:
+        da = da.rename(mapping)
+    ys, xs = bbox_window(grid, bbox, cache_dir)
+    da = da.isel({lat_name: ys, lon_name: xs})
+    return da.assign_coords({lat_name: grid["lat"][ys], lon_name: grid["lon"][xs]})
+
+def to_2d(da, grid: dict) -> np.ndarray:
+    """잘린 창을 (lat, lon) 2차원 numpy 배열로. L3의 길이 1 보조 차원(time 등)은 첫 인덱스 사용"""
+    lat_name, lon_name = grid["lat_name"], grid["lon_name"]
+    extra = {d: 0 for d in da.dims if d not in (lat_name, lon_name)}
+    if extra:
+        da = da.isel(extra)
+    return np.asarray(da.transpose(lat_name, lon_name).values)
+
+def nc_window(var, grid: dict, bbox, cache_dir: Optional[str] = GRID_CACHE_DIR) -> np.ndarray:
+    """netCDF4 변수에서 BBOX 창만 직접 읽어 (lat, lon) float 배열로. fill/유효범위 밖은 NaN"""
+    ys, xs = bbox_window(grid, bbox, cache_dir)
+    idx, kept = [], []
+    for n in var.shape:
+        if n == grid["lat"].size:
+            idx.append(ys); kept.append("lat")
+        elif n == grid["lon"].size:
+            idx.append(xs); kept.append("lon")
+        else:
+            idx.append(0)
+    arr = np.ma.filled(np.ma.asarray(var[tuple(idx)], dtype="f8"), np.nan)
+    return arr.T if kept == ["lon", "lat"] else arr
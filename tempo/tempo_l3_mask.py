@@ -0,0 +1,79 @@
+# tempo_l3_mask.py
+# TEMPO L3 공용 마스킹 커널 (NO2 / O3 / HCHO 공통)
+# - _FillValue / missing_value / valid_min·max(valid_range) / 유한성 / (선택) 양수 검사를
+#   da.where(...) 여러 번 대신 bool 마스크 하나에 누적 → 마지막에 한 번만 NaN 대입
+# - 원시(스케일 정수) 창이면 비교는 packed 값 그대로, 언팩(scale/offset)은 마스크 적용과 함께 한 번
+# - xarray가 mask_and_scale=True로 이미 fill을 NaN으로 바꿨으면 fill 재비교 생략
+
+import numpy as np
+import xarray as xr
+
+def _packed_params(da: xr.DataArray):
+    """(raw 여부, scale, offset). raw면 attrs에, 디코드됐으면 encoding에 scale/offset이 있음"""
+    attrs, enc = da.attrs, da.encoding
+    raw = any(k in attrs for k in ("_FillValue", "scale_factor", "add_offset"))
+    src = attrs if raw else enc
+    return raw, float(src.get("scale_factor", 1.0)), float(src.get("add_offset", 0.0))
+
+def _valid_bounds(da: xr.DataArray):
+    vmin, vmax = da.attrs.get("valid_min"), da.attrs.get("valid_max")
+    vrange = da.attrs.get("valid_range")
+    if vrange is not None and len(vrange) == 2:
+        vmin = vrange[0] if vmin is None else vmin
+        vmax = vrange[1] if vmax is None else vmax
+    return (None if vmin is None else float(vmin)), (None if vmax is None else float(vmax))
+
+def valid_mask(values: np.ndarray, fill=None, vmin=None, vmax=None, gt=None) -> np.ndarray:
+    """유효 픽셀 bool 마스크. 비교 결과는 scratch 버퍼 하나에 받아 누적(임시 배열 할당 없음)"""
+    if np.issubdtype(values.dtype, np.floating):
+        ok = np.isfinite(values)
+    else:
+        ok = np.ones(values.shape, dtype=bool)
+    tmp = np.empty(values.shape, dtype=bool)
+    for op, ref in ((np.not_equal, fill), (np.greater_equal, vmin),
+                    (np.less_equal, vmax), (np.greater, gt)):
+        if ref is None:
+            continue
+        op(values, ref, out=tmp)
+        np.logical_and(ok, tmp, out=ok)
+    return ok
+
+def clean_values(da: xr.DataArray, remove_negative: bool = False, valid_range: bool = True) -> xr.DataArray:
+    """fill/유효범위/유한성/(선택)음수 제거를 한 번에 적용. BBOX로 자른 창(window)을 넘길 것
+    valid_range=False면 유효범위 검사 없이 fill→NaN + 언팩만 (xarray CF 디코드와 같은 값)"""
+    raw, scale, offset = _packed_params(da)
+    vals = da.values
+    vmin, vmax = _valid_bounds(da) if valid_range else (None, None)
+
+    # 비교는 vals와 같은 단위로: raw면 packed 단위(CF 규약), 디코드됐으면 물리 단위로 환산
+    fill = None
+    if raw:
+        fill = da.attrs.get("_FillValue", da.attrs.get("missing_value"))
+    elif (scale, offset) != (1.0, 0.0):
+        lo = None if vmin is None else vmin * scale + offset
+        hi = None if vmax is None else vmax * scale + offset
+        vmin, vmax = (lo, hi) if scale > 0 else (hi, lo)
+    gt = None
+    if remove_negative:
+        # 물리값 > 0  ⇔  packed > -offset/scale (scale > 0)
+        gt = -offset / scale if raw else 0.0
+    ok = valid_mask(vals, fill, vmin, vmax, gt)
+
+    # 결과 배열: 언팩이 필요하면 float으로 한 번만 변환, 아니면 읽어 온 창 버퍼를 제자리 수정
+    if raw and (scale, offset) != (1.0, 0.0):
+        out = vals.astype("f8")
+        out *= scale
+        out += offset
+    elif np.issubdtype(vals.dtype, np.floating):
+        out = vals if vals.flags.writeable else vals.copy()
+    else:
+        out = vals.astype("f8")
+    np.logical_not(ok, out=ok)
+    np.copyto(out, np.nan, where=ok)
+
+    cleaned = da.copy(data=out)
+    if raw:
+        for k in ("_FillValue", "missing_value", "scale_factor", "add_offset"):
+            if k in cleaned.attrs:
+                cleaned.encoding[k] = cleaned.attrs.pop(k)
+    return cleaned
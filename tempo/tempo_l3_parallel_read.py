@@ -0,0 +1,126 @@
+# tempo_l3_parallel_read.py
+# granule 하나 안에서 여러 변수 창을 병렬로 읽기 (O3 보조 변수 7~8개 등)
+# - HDF5/netCDF-C는 기본 빌드에서 스레드 안전하지 않음 → 파일 핸들(h5py) 하나를 호출 스레드만 사용:
+#   창에 걸친 chunk의 압축된 원시 바이트만 순서대로 읽음(read_direct_chunk, 빠름)
+# - 시간 대부분인 압축 해제(zlib, GIL 해제) + shuffle 복원 + 창 배열에 복사는 작업 스레드에서 병렬로
+#   (chunk마다 쓰는 영역이 겹치지 않으므로 잠금 불필요)
+# - 지원하지 않는 필터/연속 저장 변수/h5py 없음 → 그 변수만 기존 방식(순차)으로 읽음
+# - 결과는 순차 읽기(crop_to_grid(prod[n]).load())와 같은 값/dtype의 BBOX 창 DataArray:
+#   prod를 디코드해 열었으면(기본) _FillValue→NaN, scale/offset 적용, mask_and_scale=False로 열었으면 원시 값 그대로
+
+import os, zlib, itertools
+import numpy as np
+import xarray as xr
+from concurrent.futures import ThreadPoolExecutor
+
+from tempo_l3_grid import crop_to_grid, bbox_window, dim_mapping
+
+try:
+    import h5py
+except ImportError:  # 선택 의존성 — 없으면 순차 읽기
+    h5py = None
+
+READ_WORKERS = min(8, os.cpu_count() or 1)
+
+H5Z_DEFLATE, H5Z_SHUFFLE, H5Z_FLETCHER32 = 1, 2, 3
+_POOLS = {}
+
+def _pool(workers: int) -> ThreadPoolExecutor:
+    # 프로세스당 한 번 만들어 granule마다 재사용
+    if workers not in _POOLS:
+        _POOLS[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tempo-read")
+    return _POOLS[workers]
+
+def _pipeline(dset):
+    """지원하는 필터 파이프라인이면 (shuffle, deflate, fletcher32), 아니면 None"""
+    if dset.chunks is None:
+        return None
+    plist = dset.id.get_create_plist()
+    codes = [plist.get_filter(i)[0] for i in range(plist.get_nfilters())]
+    order = [c for c in (H5Z_SHUFFLE, H5Z_DEFLATE, H5Z_FLETCHER32) if c in codes]
+    if codes != order:
+        return None
+    return H5Z_SHUFFLE in codes, H5Z_DEFLATE in codes, H5Z_FLETCHER32 in codes
+
+def _decode_into(out, out_sel, raw: bytes, in_sel, chunk_shape, dtype, pipeline):
+    shuffle, deflate, fletcher = pipeline
+    if fletcher:
+        raw = raw[:-4]  # 체크섬
+    if deflate:
+        raw = zlib.decompress(raw)
+    a = np.frombuffer(raw, dtype=np.uint8)
+    if shuffle and dtype.itemsize > 1:
+        # 바이트 위치별로 모인 평면 → 원소별 (평면 단위 복사가 전치 복사보다 빠름)
+        planes = a.reshape(dtype.itemsize, -1)
+        a = np.empty((planes.shape[1], dtype.itemsize), dtype=np.uint8)
+        for k in range(dtype.itemsize):
+            a[:, k] = planes[k]
+    out[out_sel] = a.view(dtype).reshape(chunk_shape)[in_sel]
+
+def _submit_window(dset, window, pool, futures):
+    """창에 걸친 chunk 원시 바이트를 읽어 압축 해제 작업을 제출. 창 배열 반환 (작업 완료 후 채워짐)"""
+    pipeline = _pipeline(dset)
+    if pipeline is None:
+        return dset[window]
+    chunks = dset.chunks
+    out = np.empty(tuple(s.stop - s.start for s in window), dtype=dset.dtype)
+    ranges = [range(s.start // c, (s.stop - 1) // c + 1) for s, c in zip(window, chunks)]
+    for cidx in itertools.product(*ranges):
+        offset = tuple(i * c for i, c in zip(cidx, chunks))
+        lo = [max(s.start, o) for s, o in zip(window, offset)]
+        hi = [min(s.stop, o + c) for s, o, c in zip(window, offset, chunks)]
+        out_sel = tuple(slice(a - s.start, b - s.start) for a, b, s in zip(lo, hi, window))
+        in_sel = tuple(slice(a - o, b - o) for a, b, o in zip(lo, hi, offset))
+        info = dset.id.get_chunk_info_by_coord(offset)
+        if info.byte_offset is None or info.size == 0:
+            out[out_sel] = dset.fillvalue  # 할당되지 않은 chunk
+            continue
+        mask, raw = dset.id.read_direct_chunk(offset)
+        if mask:
+            out[out_sel] = dset[tuple(slice(a, b) for a, b in zip(lo, hi))]  # 일부 필터를 건너뛴 chunk
+            continue
+        futures.append(pool.submit(_decode_into, out, out_sel, raw, in_sel, chunks, dset.dtype, pipeline))
+    return out
+
+def _window(da, grid: dict, bbox):
+    # 변수 차원별 창 (위경도 차원만 BBOX로 자름)
+    ys, xs = bbox_window(grid, bbox)
+    mapping = dim_mapping(grid, da)
+    win = []
+    for d in da.dims:
+        n = da.sizes[d]
+        s = {grid["lat_name"]: ys, grid["lon_name"]: xs}.get(mapping.get(d, d), slice(None))
+        win.append(slice(*s.indices(n)[:2]))
+    return tuple(win)
+
+def _decoded(name: str, da, raw: np.ndarray, grid: dict, bbox):
+    # prod와 같은 상태로 디코드: xarray가 mask/scale한 변수는 encoding에 _FillValue/scale_factor/add_offset이
+    # 옮겨져 있음 → 같은 CF 디코드. mask_and_scale=False로 열었으면 attrs에 남아 있음 → 원시 값/dtype 그대로
+    # (clean_values가 한 번에 fill/유효범위/언팩 처리). 시간 변수는 prod가 디코드했을 때만 시간으로 변환
+    moved = {k: da.encoding[k] for k in ("_FillValue", "missing_value", "scale_factor", "add_offset",
+                                         "units", "calendar") if k in da.encoding}
+    scaled = any(k in moved for k in ("_FillValue", "missing_value", "scale_factor", "add_offset"))
+    timed = np.issubdtype(da.dtype, np.datetime64)
+    if scaled or timed:
+        var = xr.conventions.decode_cf_variable(name, xr.Variable(da.dims, raw, {**da.attrs, **moved}),
+                                                mask_and_scale=scaled, decode_times=timed)
+        raw = np.asarray(var.values)
+    # 좌표/속성/encoding은 지연 크롭 결과 그대로, 값만 교체 (차원 순서는 원본과 같음)
+    return crop_to_grid(da, grid, bbox).copy(data=raw)
+
+def read_cropped(path: str, prod, names, grid: dict, bbox, workers: int = READ_WORKERS,
+                 group: str = "product") -> dict:
+    """{변수 이름: crop_to_grid(prod[이름], grid, bbox)와 같은 값이 메모리에 올라온 DataArray}
+    prod를 연 방식(mask_and_scale)을 그대로 따름 — workers 수와 무관하게 같은 값/dtype"""
+    names = [n for n in dict.fromkeys(names) if n]
+    if h5py is None or workers <= 1 or not names:
+        return {n: crop_to_grid(prod[n], grid, bbox).load() for n in names}
+    pool, futures, raws, wins = _pool(workers), [], {}, {}
+    with h5py.File(path, "r") as f:
+        g = f[group] if group in f else f
+        for n in names:
+            wins[n] = _window(prod[n], grid, bbox)
+            raws[n] = _submit_window(g[n], wins[n], pool, futures)
+        for fu in futures:
+            fu.result()  # 예외는 여기서 올라옴
+    return {n: _decoded(n, prod[n], raws[n], grid, bbox) for n in names}
@@ -0,0 +1,143 @@
+# tempo_l3_precheck.py
+# granule 사전 점검 — BBOX에 쓸 데이터가 없는 granule을 열기/디코드/마스킹/변환 전에 건너뜀
+# 1) 전역 속성 geospatial_*_min/max 가 BBOX와 겹치지 않으면 제외
+# 2) time_coverage_* 동안 BBOX 중심의 태양 천정각이 계속 MAX_SZA 이상이면(야간 스캔) 제외
+# 3) (선택, read_window=True) 1·2를 통과하면 메인 변수의 BBOX 창을 읽어 유효 픽셀이 0이면 제외
+#    → 통과한 granule은 추출기가 같은 창을 다시 읽으므로 기본은 끔. 유효 픽셀 0은 추출기(extract_granule)가
+#      메인 창만 읽은 직후 판단하고 나머지 변수는 열지 않음
+# 건너뛴 개수와 절약 시간(건너뛴 수 × 실제 추출 평균 시간 − 전체 점검 시간)을 기록
+
+import os, time
+import numpy as np
+import netCDF4
+from collections import Counter
+
+from tempo_l3_grid import load_grid, nc_window
+from tempo_l3_products import PRODUCTS, coverage_times, pick_main_var
+
+MAX_SZA = 88.0  # 태양 천정각(도) — 이 이상이면 야간으로 봄
+
+def solar_zenith_deg(ts, lat: float, lon: float) -> float:
+    """NOAA 근사식 태양 천정각(도). ts는 UTC Timestamp, lon은 동경 +"""
+    hour = ts.hour + ts.minute / 60 + ts.second / 3600
+    g = 2 * np.pi / 365 * (ts.dayofyear - 1 + (hour - 12) / 24)
+    decl = (0.006918 - 0.399912 * np.cos(g) + 0.070257 * np.sin(g)
+            - 0.006758 * np.cos(2 * g) + 0.000907 * np.sin(2 * g)
+            - 0.002697 * np.cos(3 * g) + 0.00148 * np.sin(3 * g))
+    eqtime = 229.18 * (0.000075 + 0.001868 * np.cos(g) - 0.032077 * np.sin(g)
+                       - 0.014615 * np.cos(2 * g) - 0.040849 * np.sin(2 * g))
+    ha = np.radians((hour * 60 + eqtime + 4 * lon) / 4 - 180)
+    phi = np.radians(lat)
+    cos_z = np.sin(phi) * np.sin(decl) + np.cos(phi) * np.cos(decl) * np.cos(ha)
+    return float(np.degrees(np.arccos(np.clip(cos_z, -1, 1))))
+
+def _bounds_miss(attrs, bbox) -> bool:
+    keys = ("geospatial_lat_min", "geospatial_lat_max", "geospatial_lon_min", "geospatial_lon_max")
+    if not all(k in attrs for k in keys):
+        return False  # 속성이 없으면 판단 보류
+    la0, la1, lo0, lo1 = (float(attrs[k]) for k in keys)
+    lon_min, lat_min, lon_max, lat_max = bbox
+    return la1 < lat_min or la0 > lat_max or lo1 < lon_min or lo0 > lon_max
+
+def _attr_check(attrs: dict, fname: str, bbox, max_sza: float = MAX_SZA):
+    # 1) 범위 속성 2) BBOX 중심의 야간 여부 — 파일 속성만 사용
+    if _bounds_miss(attrs, bbox):
+        return False, "BBOX와 겹치지 않음"
+    t0, t1, tm = coverage_times(attrs, fname)
+    lon_c, lat_c = (bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2
+    sza = min(solar_zenith_deg(t, lat_c, lon_c) for t in (t0, tm, t1))
+    if sza >= max_sza:
+        return False, f"야간 스캔 (SZA {sza:.0f}° ≥ {max_sza:.0f}°)"
+    return True, ""
+
+def precheck_each(path: str, bboxes, max_sza: float = MAX_SZA) -> list:
+    """BBOX 여러 개(측정소 타일 등)를 속성만으로 점검 → [(통과 여부, 사유)]. 파일 속성은 한 번만 읽음"""
+    with netCDF4.Dataset(path) as nc:
+        attrs = {k: nc.getncattr(k) for k in nc.ncattrs()}
+    return [_attr_check(attrs, os.path.basename(path), b, max_sza) for b in bboxes]
+
+def precheck(path: str, kind: str, bbox, read_window: bool = False, max_sza: float = MAX_SZA):
+    """(통과 여부, 사유). 사유는 건너뛸 때만. read_window=True면 속성 점검 통과 후 창을 항상 읽음"""
+    if bbox is None:
+        return True, ""
+    fname = os.path.basename(path)
+    with netCDF4.Dataset(path) as nc:
+        attrs = {k: nc.getncattr(k) for k in nc.ncattrs()}
+        ok, why = _attr_check(attrs, fname, bbox, max_sza)
+        if not ok:
+            return ok, why
+
+        if read_window:
+            grid = load_grid(path)
+            grp = nc.groups.get("product", nc)
+            arr = nc_window(grp.variables[pick_main_var(grp, kind)], grid, bbox)
+            ok = np.isfinite(arr)
+            if PRODUCTS[kind]["remove_negative"]:
+                ok &= arr > 0
+            if not ok.any():
+                return False, "BBOX 유효 픽셀 0"
+    return True, ""
+
+class PrecheckStats:
+    """사전 점검 결과 누적: 건너뛴 수(사유별), 점검 시간, 추출 시간 → 절약 시간 추정"""
+
+    def __init__(self):
+        self.skipped = Counter()
+        self.check_s = 0.0       # 전체 점검 시간 (추출기가 메인 창만 읽고 건너뛴 시간 포함)
+        self.skip_check_s = 0.0  # 건너뛴 granule의 점검 시간
+        self.extract_s = 0.0
+        self.extracted = 0
+
+    def check(self, path: str, kind: str, bbox, read_window: bool = False):
+        t = time.perf_counter()
+        try:
+            ok, why = precheck(path, kind, bbox, read_window)
+        except Exception:
+            ok, why = True, ""  # 점검 실패는 추출 단계에 맡김
+        dt = time.perf_counter() - t
+        self.check_s += dt
+        if not ok:
+            self.skipped[why.split(" (")[0]] += 1
+            self.skip_check_s += dt
+        return ok, why
+
+    def check_each(self, path: str, bboxes) -> list:
+        """BBOX별 속성 점검 → 통과한 BBOX의 bool 목록. 모두 탈락해야 granule을 건너뛴 것으로 셈"""
+        t = time.perf_counter()
+        try:
+            res = precheck_each(path, bboxes)
+        except Exception:
+            res = [(True, "")] * len(bboxes)  # 점검 실패는 추출 단계에 맡김
+        dt = time.perf_counter() - t
+        self.check_s += dt
+        keep = [ok for ok, _ in res]
+        if res and not any(keep):
+            self.skipped[res[0][1].split(" (")[0]] += 1
+            self.skip_check_s += dt
+        return keep
+
+    def record_empty(self, seconds: float):
+        """추출기가 메인 창만 읽고 유효 픽셀 0으로 건너뛴 granule (그 시간은 점검 비용으로)"""
+        self.skipped["BBOX 유효 픽셀 0"] += 1
+        self.check_s += seconds
+        self.skip_check_s += seconds
+
+    def record_extract(self, seconds: float):
+        self.extract_s += seconds
+        self.extracted += 1
+
+    @property
+    def n_skipped(self) -> int:
+        return sum(self.skipped.values())
+
+    @property
+    def saved_s(self) -> float:
+        if not self.extracted:
+            return 0.0
+        return self.n_skipped * (self.extract_s / self.extracted) - self.check_s
+
+    def summary(self) -> str:
+        why = ", ".join(f"{k} {v}" for k, v in self.skipped.most_common()) or "없음"
+        return (f"사전 점검: 건너뜀 {self.n_skipped}개 ({why}), "
+                f"점검 {self.check_s:.1f}s (통과한 granule {self.check_s - self.skip_check_s:.1f}s), "
+                f"절약 추정 {self.saved_s:.1f}s")
@@ -0,0 +1,150 @@
+# tempo_l3_products.py
+# TEMPO L3 V03 제품별(NO2 / O3 / HCHO) 공용 규칙
+# - 메인 변수 / 구름 변수 / QA 변수 / 제품별 보조 변수 후보, 출력 열 이름, 음수 제거 여부 (L2 swath도 같은 후보 사용)
+# - CMR 검색 조건("cmr") — NRT 폴링과 백필이 같은 컬렉션을 받도록 여기 한 곳에만 둠
+# - 파일명 → 제품 종류 / 스캔 시각 / 스캔·granule 번호
+
+import os, re
+import pandas as pd
+from typing import Optional
+
+PRODUCTS = {
+    "no2": {
+        "file_tag": "TEMPO_NO2_L3",
+        "cmr": {"concept_id": "C2930763263-LARC_CLOUD"},          # TEMPO_NO2_L3_V03
+        "l2_tag": "TEMPO_NO2_L2",
+        "column": "no2",
+        "main": ["vertical_column_troposphere", "vertical_column", "no2_vertical_column", "no2_column"],
+        "main_keywords": [("no2", "column"), ("no2", "vertical"), ("column",)],
+        "cloud": ["cloud_fraction", "effective_cloud_fraction", "scene_cloud_fraction",
+                  "cloud_radiance_fraction", "cloud_frac"],
+        "extras": {
+            "vertical_column_troposphere_precision": [
+                "vertical_column_troposphere_precision", "tropospheric_vertical_column_precision",
+                "no2_tropospheric_vertical_column_precision", "precision_trop"],
+            "air_mass_factor_troposphere": ["air_mass_factor_troposphere", "amf_troposphere", "tropospheric_amf"],
+        },
+        "remove_negative": True,
+    },
+    "o3": {
+        "file_tag": "TEMPO_O3TOT_L3",
+        "cmr": {"concept_id": "C2930764281-LARC_CLOUD"},          # TEMPO_O3TOT_L3_V03
+        "l2_tag": "TEMPO_O3TOT_L2",
+        "column": "o3",
+        "main": ["column_amount_o3", "total_ozone_column", "ozone_total_column", "o3_total_column"],
+        "main_keywords": [("ozone", "column"), ("o3", "column"), ("ozone",)],
+        "cloud": ["effective_cloud_fraction", "cloud_fraction", "fc", "cloud_frac"],
+        "extras": {
+            "total_ozone_column_precision": [
+                "total_ozone_column_precision", "total_ozone_column_uncertainty",
+                "ozone_total_column_precision", "ozone_total_column_uncertainty",
+                "o3_total_column_precision", "o3_total_column_uncertainty",
+                "precision_total_ozone", "uncertainty_total_ozone"],
+            "radiative_cloud_fraction": ["radiative_cloud_fraction", "radiative_cloud_frac"],
+            "cloud_optical_centroid_pressure": ["cloud_optical_centroid_pressure", "ocp"],
+            "solar_zenith_angle": ["solar_zenith_angle", "sza"],
+            "viewing_zenith_angle": ["viewing_zenith_angle", "vza"],
+        },
+        "remove_negative": False,
+    },
+    "hcho": {
+        "file_tag": "TEMPO_HCHO_L3",
+        "cmr": {"short_name": "TEMPO_HCHO_L3", "version": "V03"},
+        "l2_tag": "TEMPO_HCHO_L2",
+        "column": "hcho",
+        "main": ["vertical_column", "hcho_vertical_column"],
+        "main_keywords": [("column",), ("hcho",)],
+        "cloud": ["cloud_fraction", "effective_cloud_fraction", "cloud_radiance_fraction"],
+        "extras": {},
+        "remove_negative": True,
+    },
+}
+
+QA_CANDS = ["qa_value", "main_data_quality_flag", "quality_flag", "quality_value", "qa"]
+
+# 파일명에서 시간 문자열 추출: YYYYMMDDThhmm 또는 YYYYMMDDThhmmss (뒤에 Z 있을 수도)
+TS_PAT = re.compile(r".*?(\d{8}T\d{4,6})(?:Z|_)?", re.IGNORECASE)
+# 예: TEMPO_NO2_L3_V03_20250601T103345Z_S001.nc → 버전 V03, 스캔 S001 (L2는 뒤에 G번호)
+VER_PAT  = re.compile(r"_(V\d{2})_", re.IGNORECASE)
+SCAN_PAT = re.compile(r"_S(\d{3})(?:G(\d{2}))?", re.IGNORECASE)
+
+def time_from_filename(fname: str) -> pd.Timestamp:
+    m = TS_PAT.match(fname)
+    if not m:
+        raise ValueError(f"파일명에서 시간 패턴을 찾지 못함: {fname}")
+    stamp = m.group(1)  # e.g., 20250618T1900 or 20250618T190023
+    fmt = "%Y%m%dT%H%M%S" if len(stamp) == 15 else "%Y%m%dT%H%M"
+    return pd.to_datetime(stamp, format=fmt, utc=True)
+
+def kind_from_filename(fname: str, level: str = "L3") -> Optional[str]:
+    up = os.path.basename(fname).upper()
+    tag = "file_tag" if level == "L3" else "l2_tag"
+    for kind, spec in PRODUCTS.items():
+        if spec[tag] in up:
+            return kind
+    return None
+
+def version_from_filename(fname: str) -> Optional[str]:
+    m = VER_PAT.search(fname)
+    return m.group(1).upper() if m else None
+
+def scan_from_filename(fname: str):
+    """(스캔 번호, granule 번호). 없으면 None"""
+    m = SCAN_PAT.search(fname)
+    if not m:
+        return None, None
+    return int(m.group(1)), (int(m.group(2)) if m.group(2) else None)
+
+def _pick(dvars, candidates, keywords=()):
+    lower_map = {k.lower(): k for k in dvars}
+    for cand in candidates:
+        if cand.lower() in lower_map:
+            return lower_map[cand.lower()]
+    for words in keywords:
+        for v in dvars:
+            if all(w in v.lower() for w in words):
+                return v
+    return None
+
+def _var_names(prod):
+    # xarray Dataset이면 data_vars, netCDF4 Group이면 variables, 이름 목록이면 그대로
+    if isinstance(prod, (list, tuple)):
+        return list(prod)
+    return list(prod.data_vars) if hasattr(prod, "data_vars") else list(prod.variables)
+
+def pick_main_var(prod, kind: str) -> str:
+    spec = PRODUCTS[kind]
+    names = _var_names(prod)
+    name = _pick(names, spec["main"], spec["main_keywords"])
+    if name is None:
+        raise RuntimeError(f"{kind.upper()} 변수 자동 탐색 실패: {names}")
+    return name
+
+def pick_cloud_var(prod, kind: str) -> Optional[str]:
+    return _pick(_var_names(prod), PRODUCTS[kind]["cloud"], [("cloud", "fraction")])
+
+def pick_qa_var(prod) -> Optional[str]:
+    return _pick(_var_names(prod), QA_CANDS)
+
+def pick_extra_vars(prod, kind: str) -> dict:
+    """{출력 열 이름: 변수 이름} — cloud_fraction, 제품별 보조 변수, qa_value 순 (없는 것은 빠짐)"""
+    names = _var_names(prod)
+    found = {"cloud_fraction": pick_cloud_var(names, kind)}
+    for col, cands in PRODUCTS[kind]["extras"].items():
+        found[col] = _pick(names, cands)
+    found["qa_value"] = pick_qa_var(names)
+    return {col: v for col, v in found.items() if v is not None}
+
+def coverage_times(attrs, fname: str):
+    """(시작, 끝, 중간) 시각. time_coverage_*_since_epoch → time_coverage_* ISO → 파일명 순으로 시도"""
+    s0 = attrs.get("time_coverage_start_since_epoch")
+    s1 = attrs.get("time_coverage_end_since_epoch")
+    if s0 is not None and s1 is not None:
+        t0 = pd.to_datetime(float(s0), unit="s", utc=True)
+        t1 = pd.to_datetime(float(s1), unit="s", utc=True)
+    elif attrs.get("time_coverage_start") and attrs.get("time_coverage_end"):
+        t0 = pd.to_datetime(attrs["time_coverage_start"], utc=True)
+        t1 = pd.to_datetime(attrs["time_coverage_end"], utc=True)
+    else:
+        t0 = t1 = time_from_filename(os.path.basename(fname))
+    return t0, t1, t0 + (t1 - t0) / 2
@@ -0,0 +1,100 @@
+# tempo_l3_pyramid.py
+# 다해상도 블록 평균(0.1° / 0.25° / 0.5° …) — 넓은 영역 분석용 거친 레벨
+# - 원본 픽셀 중심이 속한 거친 셀(전역 -90°/-180° 기준 정렬)에 모아 평균 → 배율이 정수가 아니어도 됨
+#   (0.25° / 0.02° = 12.5), 크롭 창이 달라도 같은 셀 경계
+# - 마스킹된(NaN) 픽셀은 빼고 유효 픽셀 수로 가중: mean = Σ유효값 / n_valid, n_valid·n_pixels도 함께 저장
+#   → 더 거친 레벨/여러 granule로 다시 모을 때 Σ(mean × n_valid) / Σn_valid 로 정확히 합칠 수 있음
+
+import os
+import numpy as np
+import pandas as pd
+import xarray as xr
+from glob import glob
+
+from tempo_l3_grid import load_grid, crop_to_grid, bbox_window, to_2d
+from tempo_l3_mask import clean_values
+from tempo_l3_products import PRODUCTS, kind_from_filename, time_from_filename, pick_main_var
+
+# ===== 사용자 설정 (단독 실행: 폴더의 granule → 레벨별 긴 형식 CSV) =====
+IN_DIR  = r""
+OUT_CSV = r""                          # 레벨별로 <이름>_<셀 크기>deg.csv
+BBOX    = None                         # None이면 granule 전체(CONUS)
+KINDS   = ("no2", "o3", "hcho")
+REMOVE_NEGATIVE = True
+LEVELS  = (0.1, 0.25, 0.5)             # 셀 크기(도)
+
+def _cells(coord: np.ndarray, res: float, origin: float):
+    # 좌표 → 전역 셀 번호 (셀 경계에 걸린 중심은 위쪽 셀로)
+    idx = np.floor((coord.astype("f8") - origin) / res + 1e-9).astype("i8")
+    uniq, inv = np.unique(idx, return_inverse=True)
+    return uniq, inv
+
+def block_mean(lat: np.ndarray, lon: np.ndarray, arrays: dict, res: float) -> pd.DataFrame:
+    """(lat, lon) 창의 배열들 → res° 셀별 유효 픽셀 평균/개수. 유효 픽셀이 하나도 없는 셀은 제외"""
+    uy, ry = _cells(lat, res, -90.0)
+    ux, rx = _cells(lon, res, -180.0)
+    cell = (ry[:, None] * ux.size + rx[None, :]).ravel()
+    n_cells = uy.size * ux.size
+    out = {
+        "lat": np.repeat((uy + 0.5) * res - 90.0, ux.size),
+        "lon": np.tile((ux + 0.5) * res - 180.0, uy.size),
+        "n_pixels": np.bincount(cell, minlength=n_cells),
+    }
+    any_valid = np.zeros(n_cells, dtype=bool)
+    for name, arr in arrays.items():
+        v = np.asarray(arr, dtype="f8").ravel()
+        ok = np.isfinite(v)
+        n = np.bincount(cell[ok], minlength=n_cells)
+        s = np.bincount(cell[ok], weights=v[ok], minlength=n_cells)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[name] = np.where(n > 0, s / n, np.nan)
+        out[f"{name}_n_valid"] = n
+        any_valid |= n > 0
+    df = pd.DataFrame(out)[any_valid]
+    df["lat"], df["lon"] = df["lat"].round(6), df["lon"].round(6)
+    return df.reset_index(drop=True)
+
+def block_levels(lat: np.ndarray, lon: np.ndarray, arrays: dict, levels=LEVELS) -> dict:
+    """{셀 크기: block_mean 결과}. 각 레벨은 원본 해상도에서 바로 계산"""
+    return {res: block_mean(lat, lon, arrays, res) for res in levels}
+
+def level_path(base_csv: str, res: float) -> str:
+    stem, ext = os.path.splitext(base_csv)
+    return f"{stem}_{res:g}deg{ext or '.csv'}"
+
+def main():
+    files = [p for p in sorted(glob(os.path.join(IN_DIR, "*.nc"))) if kind_from_filename(p) in KINDS]
+    if not files:
+        raise FileNotFoundError(f".nc 파일이 없습니다: {IN_DIR}")
+    out = {res: [] for res in LEVELS}
+    for p in files:
+        fname, kind = os.path.basename(p), kind_from_filename(p)
+        try:
+            grid = load_grid(p)
+            ys, xs = bbox_window(grid, BBOX)
+            prod = xr.open_dataset(p, group="product", engine="netcdf4", decode_cf=True, mask_and_scale=False)
+            try:
+                da = clean_values(crop_to_grid(prod[pick_main_var(prod, kind)], grid, BBOX),
+                                  remove_negative=REMOVE_NEGATIVE and PRODUCTS[kind]["remove_negative"])
+                vals = to_2d(da, grid)
+            finally:
+                prod.close()
+            for res, df in block_levels(grid["lat"][ys], grid["lon"][xs], {"value": vals}).items():
+                df.insert(0, "product_kind", kind)
+                df.insert(0, "time_utc", time_from_filename(fname).strftime("%Y-%m-%dT%H:%M:%SZ"))
+                df["source_file"] = fname
+                out[res].append(df)
+            print(f"[OK] {fname}")
+        except Exception as e:
+            print(f"[SKIP] {fname} -> {e}")
+
+    os.makedirs(os.path.dirname(OUT_CSV), exist_ok=True)
+    for res, parts in out.items():
+        if parts:
+            df = pd.concat(parts, ignore_index=True)
+            df.to_csv(level_path(OUT_CSV, res), index=False, encoding="utf-8")
+            print(f"▶ {res:g}°: {level_path(OUT_CSV, res)} (rows={len(df):,})")
+    print("\n✅ 완료")
+
+if __name__ == "__main__":
+    main()
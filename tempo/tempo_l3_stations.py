@@ -0,0 +1,193 @@
+# tempo_l3_stations.py
+# 지상 측정소/센서 위치에서 TEMPO L3 값 추출 (station collocation)
+# - 측정소 표 → 격자 인덱스 매핑은 격자(지문)당 한 번만 (가까운 픽셀 + 선택적 k×k 이웃, 거리 가중)
+# - 측정소를 WINDOW_DEG 타일로 묶고, granule마다 타일별로 그 측정소들을 감싸는 작은 창만 읽어
+#   numpy fancy-index로 값을 모음 (멀리 떨어진 측정소끼리 CONUS 크기 창을 읽지 않도록)
+# - 출력: 측정소 × granule 당 한 행 (station_id, time_utc, product_kind, value, qa_value, cloud_fraction ...)
+
+import os, time, hashlib
+import numpy as np
+import pandas as pd
+import xarray as xr
+from glob import glob
+
+from tempo_l3_grid import load_grid, crop_to_grid, to_2d
+from tempo_l3_mask import clean_values
+from tempo_l3_precheck import PrecheckStats
+from tempo_l3_products import (PRODUCTS, kind_from_filename, time_from_filename,
+                               pick_main_var, pick_cloud_var, pick_qa_var)
+
+# ===== 사용자 설정 =====
+STATIONS_CSV = r""                 # 측정소 표 (아래 STATION_COLS 열 포함)
+STATION_COLS = {"id": "station_id", "lat": "lat", "lon": "lon"}
+IN_DIR   = r""                     # 제품이 섞여 있어도 됨 — 파일명으로 제품 구분
+OUT_CSV  = r""
+KINDS    = ("no2", "o3", "hcho")
+NEIGHBORHOOD = 1                   # k×k 이웃 평균 (홀수, 1이면 가장 가까운 픽셀만)
+WEIGHTING    = "mean"              # "mean": 단순 평균 / "idw": 픽셀 중심까지 거리 역가중
+MAX_DIST_KM  = 5.0                 # 가장 가까운 픽셀 중심이 이보다 멀면 격자 밖 측정소로 보고 제외
+REMOVE_NEGATIVE = True             # NO2/HCHO만 적용 (PRODUCTS[...]["remove_negative"])
+PRECHECK = True                    # 타일(WINDOW_DEG)별 BBOX로 속성/야간 사전 점검 — 탈락한 타일은 읽지 않음
+WINDOW_DEG = 1.0                   # 이 크기(도) 타일마다 창 하나씩 읽음 (None이면 측정소 전체를 창 하나로)
+
+KM_PER_DEG = 111.195
+_INDEX = {}  # (격자 지문, 측정소 키, 설정) -> 인덱스
+
+def load_stations(path: str) -> pd.DataFrame:
+    st = pd.read_csv(path)
+    st = st.rename(columns={v: k for k, v in STATION_COLS.items()})[["id", "lat", "lon"]]
+    return st.dropna(subset=["lat", "lon"]).drop_duplicates("id").reset_index(drop=True)
+
+def _nearest(axis: np.ndarray, v: np.ndarray) -> np.ndarray:
+    # 오름/내림차순 1차원 좌표에서 가장 가까운 인덱스
+    asc = axis[-1] >= axis[0]
+    a = axis if asc else axis[::-1]
+    i = np.clip(np.searchsorted(a, v), 1, a.size - 1)
+    i -= (v - a[i - 1]) < (a[i] - v)
+    return i if asc else a.size - 1 - i
+
+def station_index(grid: dict, st: pd.DataFrame, k: int = NEIGHBORHOOD, weighting: str = WEIGHTING,
+                  max_dist_km: float = MAX_DIST_KM, window_deg=WINDOW_DEG) -> dict:
+    """측정소 → 격자 인덱스/가중치 (n, k*k) + 타일별 읽기 창. 격자·측정소 표·설정별로 한 번만 계산"""
+    lat, lon = st["lat"].to_numpy("f8"), st["lon"].to_numpy("f8")
+    key = (grid["fingerprint"], hashlib.sha1(np.stack([lat, lon]).tobytes()).hexdigest()[:16], k, weighting,
+           float(max_dist_km), window_deg)
+    idx = _INDEX.get(key)
+    if idx is not None:
+        return idx
+
+    glat, glon = grid["lat"].astype("f8"), grid["lon"].astype("f8")
+    cy, cx = _nearest(glat, lat), _nearest(glon, lon)
+    coslat = np.cos(np.radians(lat))
+    dist0 = np.hypot(glat[cy] - lat, (glon[cx] - lon) * coslat) * KM_PER_DEG
+    ok = dist0 <= max_dist_km
+
+    dy, dx = np.meshgrid(np.arange(k) - k // 2, np.arange(k) - k // 2, indexing="ij")
+    iy, ix = cy[:, None] + dy.ravel(), cx[:, None] + dx.ravel()  # (n, k*k), 행 우선
+    inside = (iy >= 0) & (iy < glat.size) & (ix >= 0) & (ix < glon.size) & ok[:, None]
+    iy, ix = np.clip(iy, 0, glat.size - 1), np.clip(ix, 0, glon.size - 1)
+    if weighting == "idw":
+        dist = np.hypot(glat[iy] - lat[:, None], (glon[ix] - lon[:, None]) * coslat[:, None]) * KM_PER_DEG
+        w = 1.0 / np.maximum(dist, 0.1)
+    else:
+        w = np.ones(iy.shape)
+    w[~inside] = 0.0
+
+    def window(rows):
+        # rows 측정소(이웃 포함)를 감싸는 창 → (BBOX, 창 원점). BBOX로 넘겨 bbox_window 캐시 재사용
+        m = inside[rows]
+        y0, y1 = int(iy[rows][m].min()), int(iy[rows][m].max())
+        x0, x1 = int(ix[rows][m].min()), int(ix[rows][m].max())
+        bbox = (float(glon[[x0, x1]].min()), float(glat[[y0, y1]].min()),
+                float(glon[[x0, x1]].max()), float(glat[[y0, y1]].max()))
+        return bbox, y0, x0
+
+    # 타일별 읽기 창: 측정소가 흩어져 있어도 granule마다 읽는 픽셀 수는 측정소 주변으로 한정
+    rows_ok = np.flatnonzero(ok)
+    if window_deg:
+        tile = np.stack([np.floor(lat / window_deg), np.floor(lon / window_deg)], axis=1)[rows_ok]
+        _, tile_id = np.unique(tile, axis=0, return_inverse=True)
+        groups = [rows_ok[tile_id.ravel() == t] for t in range(tile_id.max() + 1)] if rows_ok.size else []
+    else:
+        groups = [rows_ok] if rows_ok.size else []
+    chunks = []
+    for rows in groups:
+        cb, y0, x0 = window(rows)
+        chunks.append({"rows": rows, "iy": iy[rows] - y0, "ix": ix[rows] - x0, "bbox": cb})
+    idx = {"chunks": chunks, "w": w, "ok": ok, "dist_km": dist0, "center": (k * k) // 2}
+    _INDEX[key] = idx
+    return idx
+
+def _weighted(vals: np.ndarray, w: np.ndarray):
+    # (n, k*k) → 유효 픽셀 가중 평균, 유효 픽셀 수
+    ok = np.isfinite(vals) & (w > 0)
+    ws = np.where(ok, w, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (np.where(ok, vals, 0.0) * ws).sum(axis=1) / ws.sum(axis=1)
+    return mean, ok.sum(axis=1)
+
+def collocate(path: str, kind: str, st: pd.DataFrame, chunks=None) -> pd.DataFrame:
+    """granule 하나 → 측정소별 한 행 (유효 픽셀이 없는 측정소는 제외)
+    chunks: 읽을 타일 (사전 점검을 통과한 것만, None이면 전체). 메인 값이 없는 타일은 보조 변수를 읽지 않음"""
+    spec = PRODUCTS[kind]
+    grid = load_grid(path)
+    idx = station_index(grid, st)
+    chunks = idx["chunks"] if chunks is None else chunks
+    sel = idx["ok"]
+    w = idx["w"][sel]
+
+    prod = xr.open_dataset(path, group="product", engine="netcdf4", decode_cf=True, mask_and_scale=False)
+    try:
+        def gather(name, **kw):
+            # 타일 창마다 읽어 그 타일 측정소 × 이웃을 한 번에 모음
+            out = np.full(idx["w"].shape, np.nan)
+            for ch in chunks:
+                a = to_2d(clean_values(crop_to_grid(prod[name], grid, ch["bbox"]), **kw), grid)
+                out[ch["rows"]] = a[ch["iy"], ch["ix"]]
+            return out[sel]
+
+        main_name = pick_main_var(prod, kind)
+        main_vals = gather(main_name, remove_negative=REMOVE_NEGATIVE and spec["remove_negative"])
+        value, n_pix = _weighted(main_vals, w)
+        # 유효 픽셀이 없는 타일(전운량/야간 쪽)은 QA/구름 창을 읽지 않음
+        has = np.zeros(sel.size, dtype=bool)
+        has[np.flatnonzero(sel)] = np.isfinite(main_vals).any(axis=1)
+        chunks = [ch for ch in chunks if has[ch["rows"]].any()]
+        rec = {
+            "station_id": st["id"].to_numpy()[sel],
+            "time_utc": time_from_filename(os.path.basename(path)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "product_kind": kind,
+            "value": value,
+            "units": prod[main_name].attrs.get("units", ""),
+            "n_pixels": n_pix,
+            "pixel_dist_km": np.round(idx["dist_km"][sel], 3),
+        }
+        qa_name = pick_qa_var(prod)
+        rec["qa_value"] = gather(qa_name)[:, idx["center"]] if qa_name else np.nan  # 중심 픽셀 QA
+        cf_name = pick_cloud_var(prod, kind)
+        rec["cloud_fraction"] = _weighted(gather(cf_name), w)[0] if cf_name else np.nan
+    finally:
+        prod.close()
+    rec["source_file"] = os.path.basename(path)
+    df = pd.DataFrame(rec)
+    return df[df["n_pixels"] > 0]
+
+def main():
+    st = load_stations(STATIONS_CSV)
+    files = [p for p in sorted(glob(os.path.join(IN_DIR, "*.nc"))) if kind_from_filename(p) in KINDS]
+    if not files:
+        raise FileNotFoundError(f".nc 파일이 없습니다: {IN_DIR}")
+    print(f"▶ 측정소 {len(st):,}개 × granule {len(files)}개")
+
+    out_list = []
+    stats = PrecheckStats()
+    for p in files:
+        fname, kind = os.path.basename(p), kind_from_filename(p)
+        try:
+            chunks = None
+            if PRECHECK:
+                # 측정소 전체 외곽 대신 타일마다 (외곽 중심 하나로 야간을 판단하면 동/서 끝 타일을 잘못 버림)
+                chunks = station_index(load_grid(p), st)["chunks"]
+                chunks = [ch for ch, ok in zip(chunks, stats.check_each(p, [ch["bbox"] for ch in chunks])) if ok]
+                if not chunks:
+                    print(f"[SKIP] {fname} -> 사전 점검: 모든 타일 탈락")
+                    continue
+            t = time.perf_counter()
+            df = collocate(p, kind, st, chunks)
+            stats.record_extract(time.perf_counter() - t)
+            out_list.append(df)
+            print(f"[OK] {fname} (stations={len(df):,})")
+        except Exception as e:
+            print(f"[SKIP] {fname} -> {e}")
+    if PRECHECK:
+        print(stats.summary())
+
+    if not out_list:
+        raise RuntimeError("처리 가능한 파일이 없습니다.")
+    out = pd.concat(out_list, ignore_index=True).sort_values(["time_utc", "product_kind", "station_id"])
+    os.makedirs(os.path.dirname(OUT_CSV), exist_ok=True)
+    out.to_csv(OUT_CSV, index=False, encoding="utf-8")
+    print(f"\n✅ 완료: {OUT_CSV} (rows={len(out):,})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# tempo_l3_tiles.py
+# granule → 색상 지도 XYZ 타일(PNG/WebP) 피라미드 — 웹 지도는 정적 파일만 받으면 됨
+# - 레이어 = 제품 × granule 시각: TILE_DIR/layers/<kind>/<YYYYMMDDTHHMMSSZ>/<z>/<x>/<y>.png
+# - 타일 내용은 해시 주소 저장소(TILE_DIR/objects/<sha256 앞 2자리>/<sha256>.<ext>)에 한 번만 저장,
+#   레이어 경로는 그 객체로의 하드링크 (같은 타일은 디스크에 한 벌)
+# - 유효 픽셀이 없는 타일은 만들지 않음
+# - 레이어별 manifest.json에 원본 크기/수정시각을 기록 → 새 granule(또는 바뀐 granule)의 타일만 다시 만듦
+# - L3 격자는 규칙 위경도 격자 → 웹 메르카토르 타일의 행은 위도, 열은 경도에만 의존하므로
+#   타일 하나는 (행 인덱스 × 열 인덱스) fancy-index 한 번으로 재표본화
+
+import os, io, json, time, hashlib, shutil
+import numpy as np
+import xarray as xr
+from glob import glob
+from PIL import Image
+
+from tempo_l3_grid import load_grid, crop_to_grid, bbox_window, to_2d
+from tempo_l3_mask import clean_values
+from tempo_l3_products import PRODUCTS, kind_from_filename, time_from_filename, pick_main_var
+
+# ===== 사용자 설정 =====
+IN_DIR   = r""
+TILE_DIR = r""
+KINDS    = ("no2", "o3", "hcho")
+BBOX     = (-74.3, 40.4, -73.6, 41.0)  # None이면 granule 전체(CONUS)
+ZOOMS    = range(8, 13)                # 렌더링할 줌 레벨
+FORMAT   = "png"                       # "png" / "webp" (무손실)
+TILE_SIZE = 256
+REMOVE_NEGATIVE = True
+COLOR_RANGE = {"no2": (0.0, 2e16), "hcho": (0.0, 3e16), "o3": (220.0, 400.0)}  # 색 척도 (선형, 범위 밖은 끝 색)
+# 색 막대 기준점 (viridis 근사) → 256단계 LUT
+COLOR_STOPS = [(68, 1, 84), (59, 82, 139), (33, 145, 140), (94, 201, 98), (253, 231, 37)]
+ALPHA = 200                            # 유효 픽셀 불투명도 (빈 픽셀은 투명)
+
+def _lut() -> np.ndarray:
+    stops = np.array(COLOR_STOPS, dtype="f8")
+    pos = np.linspace(0, 1, len(stops))
+    t = np.linspace(0, 1, 256)
+    rgb = np.stack([np.interp(t, pos, stops[:, c]) for c in range(3)], axis=1)
+    return np.concatenate([rgb, np.full((256, 1), ALPHA)], axis=1).astype("u1")
+
+LUT = _lut()
+
+# ===== 타일 좌표 =====
+def tile_range(lon_min, lat_min, lon_max, lat_max, z: int):
+    """BBOX를 덮는 타일 x, y 범위 (포함)"""
+    n = 2 ** z
+    lat_c = np.clip([lat_max, lat_min], -85.0511, 85.0511)
+    x0, x1 = (int(np.floor((v + 180.0) / 360.0 * n)) for v in (lon_min, lon_max))
+    y0, y1 = (int(np.floor((1 - np.arcsinh(np.tan(np.radians(v))) / np.pi) / 2 * n)) for v in lat_c)
+    return max(x0, 0), min(x1, n - 1), max(y0, 0), min(y1, n - 1)
+
+def tile_pixel_coords(z: int, x: int, y: int, size: int = TILE_SIZE):
+    """타일 픽셀 중심의 (경도 열 벡터, 위도 행 벡터)"""
+    n = 2 ** z * size
+    px = x * size + np.arange(size) + 0.5
+    py = y * size + np.arange(size) + 0.5
+    lon = px / n * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * py / n))))
+    return lon, lat
+
+def _axis_index(coords: np.ndarray, v: np.ndarray):
+    # 규칙 격자에서 가장 가까운 인덱스와 격자 안 여부 (격자 밖 반 칸까지는 허용)
+    step = (coords[-1] - coords[0]) / (coords.size - 1) if coords.size > 1 else 1.0
+    i = np.rint((v - coords[0]) / step).astype("i8")
+    ok = (i >= 0) & (i < coords.size)
+    return np.clip(i, 0, coords.size - 1), ok
+
+# ===== 렌더링 =====
+def colorize(vals: np.ndarray, kind: str) -> np.ndarray:
+    vmin, vmax = COLOR_RANGE[kind]
+    ok = np.isfinite(vals)
+    idx = np.clip((np.nan_to_num(vals) - vmin) / (vmax - vmin) * 255, 0, 255).astype("u1")
+    rgba = LUT[idx]
+    rgba[~ok] = 0
+    return rgba
+
+def encode(rgba: np.ndarray, fmt: str = FORMAT) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "webp":
+        Image.fromarray(rgba, "RGBA").save(buf, format="WEBP", lossless=True)
+    else:
+        Image.fromarray(rgba, "RGBA").save(buf, format="PNG")
+    return buf.getvalue()
+
+def read_field(path: str, kind: str, bbox=BBOX):
+    """granule → (격자 창의 위도, 경도, (lat, lon) 값)"""
+    spec = PRODUCTS[kind]
+    grid = load_grid(path)
+    ys, xs = bbox_window(grid, bbox)
+    prod = xr.open_dataset(path, group="product", engine="netcdf4", decode_cf=True, mask_and_scale=False)
+    try:
+        da = clean_values(crop_to_grid(prod[pick_main_var(prod, kind)], grid, bbox),
+                          remove_negative=REMOVE_NEGATIVE and spec["remove_negative"])
+        vals = to_2d(da, grid)
+    finally:
+        prod.close()
+    return grid["lat"][ys].astype("f8"), grid["lon"][xs].astype("f8"), vals
+
+def render_tiles(lat: np.ndarray, lon: np.ndarray, vals: np.ndarray, kind: str, zooms=ZOOMS):
+    """유효 픽셀이 있는 타일만 {(z, x, y): 인코딩된 bytes}로 생성"""
+    valid = np.isfinite(vals)
+    if not valid.any():
+        return {}
+    rows, cols = np.nonzero(valid.any(axis=1))[0], np.nonzero(valid.any(axis=0))[0]
+    la, lo = lat[rows[[0, -1]]], lon[cols[[0, -1]]]
+    out = {}
+    for z in zooms:
+        x0, x1, y0, y1 = tile_range(lo.min(), la.min(), lo.max(), la.max(), z)
+        for x in range(x0, x1 + 1):
+            tlon, _ = tile_pixel_coords(z, x, 0)
+            ix, okx = _axis_index(lon, tlon)
+            if not okx.any():
+                continue
+            for y in range(y0, y1 + 1):
+                _, tlat = tile_pixel_coords(z, x, y)
+                iy, oky = _axis_index(lat, tlat)
+                if not oky.any():
+                    continue
+                tile = vals[np.ix_(iy, ix)]
+                tile[~(oky[:, None] & okx[None, :])] = np.nan
+                if not np.isfinite(tile).any():
+                    continue  # 빈 타일은 만들지 않음
+                out[(z, x, y)] = encode(colorize(tile, kind))
+    return out
+
+# ===== 해시 주소 저장소 =====
+def put_object(tile_dir: str, data: bytes, ext: str = FORMAT) -> str:
+    h = hashlib.sha256(data).hexdigest()
+    path = os.path.join(tile_dir, "objects", h[:2], f"{h}.{ext}")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".part", "wb") as f:
+            f.write(data)
+        os.replace(path + ".part", path)
+    return h
+
+def _link(src: str, dst: str):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)  # 하드링크가 안 되는 파일시스템
+
+def _write_json(path: str, obj):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=1)
+    os.replace(path + ".tmp", path)
+
+def _layer_dir(tile_dir: str, kind: str, fname: str) -> str:
+    return os.path.join(tile_dir, "layers", kind, time_from_filename(fname).strftime("%Y%m%dT%H%M%SZ"))
+
+def render_granule(path: str, kind: str = None, tile_dir: str = TILE_DIR, bbox=BBOX, zooms=ZOOMS,
+                   force: bool = False) -> int:
+    """granule 하나의 레이어 타일 생성. 이미 같은 원본/설정으로 만든 레이어면 건너뜀(-1). 만든 타일 수 반환"""
+    fname = os.path.basename(path)
+    kind = kind or kind_from_filename(fname)
+    layer = _layer_dir(tile_dir, kind, fname)
+    st = os.stat(path)
+    sig = {"source_file": fname, "source_size": st.st_size, "source_mtime": int(st.st_mtime),
+           "zooms": list(zooms), "format": FORMAT, "bbox": list(bbox) if bbox else None,
+           "color_range": list(COLOR_RANGE[kind]), "color_stops": COLOR_STOPS}
+    man_path = os.path.join(layer, "manifest.json")
+    if not force and os.path.exists(man_path):
+        with open(man_path, encoding="utf-8") as f:
+            if {k: v for k, v in json.load(f).items() if k in sig} == json.loads(json.dumps(sig)):
+                return -1
+
+    tiles = render_tiles(*read_field(path, kind, bbox), kind, zooms)
+    if os.path.isdir(layer):
+        shutil.rmtree(layer)  # 바뀐 granule: 이전 타일 제거 후 다시
+    index = {}
+    for (z, x, y), data in tiles.items():
+        h = put_object(tile_dir, data)
+        _link(os.path.join(tile_dir, "objects", h[:2], f"{h}.{FORMAT}"),
+              os.path.join(layer, str(z), str(x), f"{y}.{FORMAT}"))
+        index[f"{z}/{x}/{y}"] = h
+    os.makedirs(layer, exist_ok=True)  # 타일이 없어도 manifest는 남겨 다시 렌더링하지 않음
+    _write_json(man_path, {**sig, "kind": kind, "tiles": index})
+    return len(tiles)
+
+def update_layer_index(tile_dir: str = TILE_DIR):
+    """TILE_DIR/layers.json: 웹 지도가 읽는 레이어 목록 [{kind, time, url}]"""
+    layers = []
+    for man in sorted(glob(os.path.join(tile_dir, "layers", "*", "*", "manifest.json"))):
+        kind, ts = man.split(os.sep)[-3:-1]
+        with open(man, encoding="utf-8") as f:
+            m = json.load(f)
+        layers.append({"kind": kind, "time": ts, "n_tiles": len(m["tiles"]), "zooms": m["zooms"],
+                       "url": f"layers/{kind}/{ts}/{{z}}/{{x}}/{{y}}.{m['format']}"})
+    _write_json(os.path.join(tile_dir, "layers.json"), layers)
+    return layers
+
+def main():
+    files = [p for p in sorted(glob(os.path.join(IN_DIR, "*.nc"))) if kind_from_filename(p) in KINDS]
+    if not files:
+        raise FileNotFoundError(f".nc 파일이 없습니다: {IN_DIR}")
+    made = skipped = 0
+    t = time.perf_counter()
+    for p in files:
+        try:
+            n = render_granule(p, tile_dir=TILE_DIR, bbox=BBOX, zooms=ZOOMS)
+            if n < 0:
+                skipped += 1
+                continue
+            made += n
+            print(f"[OK] {os.path.basename(p)} → 타일 {n:,}개")
+        except Exception as e:
+            print(f"[SKIP] {os.path.basename(p)} -> {e}")
+    layers = update_layer_index(TILE_DIR)
+    n_obj = len(glob(os.path.join(TILE_DIR, "objects", "*", f"*.{FORMAT}")))
+    print(f"▶ 타일 {made:,}개 생성 ({time.perf_counter() - t:.1f}s), 변경 없는 레이어 {skipped}개 건너뜀, "
+          f"저장 객체 {n_obj:,}개")
+    print(f"\n✅ 완료: 레이어 {len(layers)}개 → {os.path.join(TILE_DIR, 'layers.json')}")
+
+if __name__ == "__main__":
+    main()
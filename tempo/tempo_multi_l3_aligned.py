@@ -0,0 +1,196 @@
+# tempo_multi_l3_aligned.py
+# 폴더의 TEMPO_{NO2,O3TOT,HCHO}_L3_V03_*.nc → 스캔 시각으로 짝짓기 → NYC BBOX → 픽셀×스캔당 한 행(wide) CSV
+# - 세 제품은 같은 L3 격자·같은 스캔 주기 → float 위경도 대신 격자 정수 인덱스(lat_idx, lon_idx)로
+#   배열 단계에서 정렬하므로 pandas join이 필요 없음
+# - time_utc 은 "파일명에 들어있는 시간"(time_from_filename)을 그대로 사용
+
+import os, time
+import numpy as np
+import pandas as pd
+import xarray as xr
+from glob import glob
+
+from tempo_l3_grid import load_grid, crop_to_grid, bbox_window, to_2d
+from tempo_l3_mask import clean_values
+from tempo_catalog import select_paths
+from tempo_l3_precheck import PrecheckStats
+from tempo_l3_pyramid import block_levels, level_path
+from tempo_l3_products import (PRODUCTS, time_from_filename, kind_from_filename, version_from_filename,
+                               pick_main_var, pick_cloud_var)
+
+# ===== 사용자 설정 =====
+IN_DIRS = {          # 제품별 .nc 폴더 (한 폴더에 섞여 있어도 됨 — 파일명으로 제품 구분)
+    "no2":  r"",
+    "o3":   r"",
+    "hcho": r"",
+}
+OUT_CSV  = r""
+BBOX     = (-74.3, 40.4, -73.6, 41.0)  # NYC
+REMOVE_NEGATIVE = True                 # NO2/HCHO만 적용 (PRODUCTS[...]["remove_negative"])
+MATCH_TOL   = pd.Timedelta(minutes=5)  # 파일명 시각 차가 이 안이면 같은 스캔
+REQUIRE_ALL = False                    # True: 모든 제품이 유효한 픽셀만 / False: 하나라도 유효하면
+WITH_CLOUD  = True                     # 제품별 구름 비율도 열로 추가 ({kind}_cloud_fraction)
+
+CATALOG_DB     = r""          # 지정하면 폴더 스캔 대신 카탈로그(tempo_catalog.py)에서 granule 선택
+CATALOG_REGION = "nyc"        # 카탈로그에 유효 픽셀이 기록된 영역 (None이면 영역 조건 없음)
+CATALOG_TIME   = (None, None) # (시작, 끝) UTC, None이면 제한 없음
+
+PRECHECK = True               # 속성/야간 사전 점검으로 쓸 데이터 없는 granule 건너뛰기
+PRECHECK_READ_WINDOW = False  # True면 메인 변수 BBOX 창도 미리 읽어 유효 픽셀 확인 (통과한 granule은 창을 두 번 읽음)
+
+LEVELS = ()                   # 예: (0.1, 0.25, 0.5) → 스캔별 블록 평균 레벨도 OUT_CSV_<셀 크기>deg.csv 로 저장
+
+def list_granules(in_dirs) -> pd.DataFrame:
+    rows = []
+    for kind, d in in_dirs.items():
+        if CATALOG_DB:
+            paths = select_paths(CATALOG_DB, kind, start=CATALOG_TIME[0], end=CATALOG_TIME[1],
+                                 region=CATALOG_REGION)
+        else:
+            paths = sorted(glob(os.path.join(d, "*.nc")))
+        for p in paths:
+            if kind_from_filename(p) != kind:
+                continue
+            rows.append((time_from_filename(os.path.basename(p)), kind, p))
+    return pd.DataFrame(rows, columns=["time", "kind", "path"])
+
+def match_scans(granules: pd.DataFrame, tol: pd.Timedelta):
+    """시각순 정렬 후 스캔 첫 granule과의 차가 tol보다 크면 새 스캔. 스캔마다 (시각, {kind: path}) 반환
+    같은 스캔에 같은 제품이 여러 개면(재처리 V03/V04 등) 최신 버전 하나만 쓰고 경고"""
+    if granules.empty:
+        return []
+    g = granules.sort_values(["time", "kind"]).reset_index(drop=True)
+    scan_id, start, ids = -1, None, []
+    for t in g["time"]:
+        if start is None or t - start > tol:  # 직전 granule이 아니라 스캔 시작 시각 기준 → 스캔 폭 ≤ tol
+            scan_id, start = scan_id + 1, t
+        ids.append(scan_id)
+    g["scan_id"] = ids
+    g["version"] = [version_from_filename(os.path.basename(p)) or "" for p in g["path"]]
+    scans = []
+    for _, grp in g.groupby("scan_id", sort=True):
+        grp = grp.sort_values(["kind", "version", "time"], ascending=[True, False, False])
+        for kind, dup in grp.groupby("kind"):
+            if len(dup) > 1:
+                print(f"[WARN] {grp['time'].min():%Y-%m-%dT%H:%MZ} {kind}: granule {len(dup)}개 → "
+                      f"{os.path.basename(dup['path'].iloc[0])} 사용")
+        paths = grp.drop_duplicates("kind").set_index("kind")["path"].to_dict()
+        scans.append((grp["time"].min(), paths))
+    return scans
+
+def read_window(path: str, kind: str):
+    """granule 하나 → (격자, {열 이름: (ny, nx) 배열}). 값은 창만 읽고 공용 커널로 정리"""
+    spec = PRODUCTS[kind]
+    grid = load_grid(path)
+    prod = xr.open_dataset(path, group="product", engine="netcdf4", decode_cf=True, mask_and_scale=False)
+    try:
+        main = crop_to_grid(prod[pick_main_var(prod, kind)], grid, BBOX)
+        main = clean_values(main, remove_negative=REMOVE_NEGATIVE and spec["remove_negative"])
+        cols = {spec["column"]: to_2d(main, grid)}
+        if WITH_CLOUD:
+            cf_name = pick_cloud_var(prod, kind)
+            if cf_name is not None:
+                cf = clean_values(crop_to_grid(prod[cf_name], grid, BBOX))
+                cols[f"{kind}_cloud_fraction"] = to_2d(cf, grid)
+    finally:
+        prod.close()
+    return grid, cols
+
+def read_scan(paths: dict):
+    """스캔 하나의 제품별 창 → (격자, {열 이름: (ny, nx) 배열})"""
+    grid, arrays = None, {}
+    for kind in IN_DIRS:
+        if kind not in paths:
+            continue
+        g, cols = read_window(paths[kind], kind)
+        if grid is None:
+            grid = g
+        elif g["fingerprint"] != grid["fingerprint"]:
+            raise RuntimeError(f"격자 불일치: {os.path.basename(paths[kind])}")
+        arrays.update(cols)
+    return grid, arrays
+
+def align_scan(ts: pd.Timestamp, paths: dict, grid=None, arrays=None) -> pd.DataFrame:
+    kinds = list(IN_DIRS)
+    if grid is None:
+        grid, arrays = read_scan(paths)
+
+    # 정수 격자 인덱스 기준 정렬 — 배열 단계에서 유효 픽셀만 선택
+    main_cols = [PRODUCTS[k]["column"] for k in kinds if k in paths]
+    valid = np.stack([np.isfinite(arrays[c]) for c in main_cols])
+    if REQUIRE_ALL and len(main_cols) < len(kinds):
+        keep = np.zeros(valid.shape[1:], dtype=bool)  # 빠진 제품이 있는 스캔은 행 없음
+    else:
+        keep = valid.all(axis=0) if REQUIRE_ALL else valid.any(axis=0)
+    iy, ix = np.nonzero(keep)
+
+    ys, xs = bbox_window(grid, BBOX)
+    y0, x0 = ys.start or 0, xs.start or 0
+    oy, ox = grid["origin"]  # 크롭 파일이면 원본 격자 기준 인덱스로
+    rec = {
+        "time_utc": ts.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "lat_idx": iy + y0 + oy,
+        "lon_idx": ix + x0 + ox,
+        grid["lat_name"]: grid["lat"][y0 + iy],
+        grid["lon_name"]: grid["lon"][x0 + ix],
+    }
+    # 열 구성은 스캔마다 동일하게 (없는 제품은 NaN/빈 문자열)
+    for kind in kinds:
+        names = [PRODUCTS[kind]["column"]] + ([f"{kind}_cloud_fraction"] if WITH_CLOUD else [])
+        for c in names:
+            rec[c] = arrays[c][iy, ix] if c in arrays else np.full(iy.size, np.nan)
+    for kind in kinds:
+        rec[f"{kind}_source_file"] = os.path.basename(paths[kind]) if kind in paths else ""
+    return pd.DataFrame(rec)
+
+def scan_levels(ts: pd.Timestamp, grid: dict, arrays: dict) -> dict:
+    """스캔 하나 → {셀 크기: 블록 평균 DataFrame} (마스킹된 픽셀은 유효 개수 가중에서 제외)"""
+    ys, xs = bbox_window(grid, BBOX)
+    levels = block_levels(grid["lat"][ys], grid["lon"][xs], arrays, LEVELS)
+    for df in levels.values():
+        df.insert(0, "time_utc", ts.strftime("%Y-%m-%dT%H:%M:%SZ"))
+    return levels
+
+def main():
+    granules = list_granules(IN_DIRS)
+    if granules.empty:
+        raise FileNotFoundError(f".nc 파일이 없습니다: {list(IN_DIRS.values())}")
+    scans = match_scans(granules, MATCH_TOL)
+    print(f"▶ granule {len(granules)}개 → 스캔 {len(scans)}개로 정렬")
+
+    out_list, level_lists = [], {res: [] for res in LEVELS}
+    stats = PrecheckStats()
+    for ts, paths in scans:
+        if PRECHECK:
+            # 제품별로 점검해 쓸 데이터 없는 granule은 스캔에서 뺌 (열은 NaN으로 유지)
+            paths = {k: p for k, p in paths.items() if stats.check(p, k, BBOX, PRECHECK_READ_WINDOW)[0]}
+        tag = f"{ts:%Y-%m-%dT%H:%MZ} [{'/'.join(k for k in IN_DIRS if k in paths)}]"
+        if not paths:
+            print(f"[SKIP] {ts:%Y-%m-%dT%H:%MZ} -> 사전 점검: 모든 제품에 BBOX 유효 데이터 없음")
+            continue
+        try:
+            t = time.perf_counter()
+            grid, arrays = read_scan(paths)
+            out_list.append(align_scan(ts, paths, grid, arrays))
+            for res, df in scan_levels(ts, grid, arrays).items():
+                level_lists[res].append(df)
+            stats.record_extract((time.perf_counter() - t) / len(paths))
+            print(f"[OK] {tag}")
+        except Exception as e:
+            print(f"[SKIP] {tag} -> {e}")
+    if PRECHECK:
+        print(stats.summary())
+
+    if not out_list:
+        raise RuntimeError("처리 가능한 스캔이 없습니다.")
+    out = pd.concat(out_list, ignore_index=True)
+    os.makedirs(os.path.dirname(OUT_CSV), exist_ok=True)
+    out.to_csv(OUT_CSV, index=False, encoding="utf-8")
+    for res, parts in level_lists.items():
+        lv = pd.concat(parts, ignore_index=True)
+        lv.to_csv(level_path(OUT_CSV, res), index=False, encoding="utf-8")
+        print(f"▶ {res:g}° 레벨: {level_path(OUT_CSV, res)} (rows={len(lv):,})")
+    print(f"\n✅ 완료: {OUT_CSV} (rows={len(out):,}, scans={len(out_list)}/{len(scans)})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# tempo_nrt_poll.py
+# TEMPO L3 준실시간(NRT) 폴링 데몬 — NO2 / O3 / HCHO 최신 시간대를 NYC BBOX로 계속 추가
+# - 제품별 high-water mark(마지막으로 처리한 granule 끝 시각) 이후 granule만 주기적으로 검색
+# - 새 granule만 다운로드 → 추출 → 제품별 CSV에 추가(append)
+# - 지연 지표: granule 끝 시각 → 행이 CSV에 기록된 시각 (nrt_latency.csv, nrt_status.json)
+# - 검색 원천(source)은 교체 가능: EarthaccessSource(CMR) / StubSource(로컬 폴더를 시간차로 공개, 테스트용)
+
+import os, json, time, shutil
+import pandas as pd
+import netCDF4
+from glob import glob
+
+from tempo_l3_extract import extract_rows
+from tempo_l3_precheck import precheck
+from tempo_l3_products import PRODUCTS, kind_from_filename, time_from_filename, coverage_times
+
+# ===== 사용자 설정 =====
+OUT_DIR   = r""                          # 제품별 CSV / 지표 / 상태 파일
+RAW_DIR   = r""                          # 받은 granule 저장 폴더
+BBOX      = (-74.3, 40.4, -73.6, 41.0)   # NYC
+POLL_S    = 300                          # 폴링 주기(초)
+OVERLAP   = pd.Timedelta(hours=2)        # high-water mark 이전으로 다시 훑는 여유 (늦게 공개되는 granule 대비)
+START_AT  = pd.Timedelta(hours=6)        # 상태 파일이 없을 때 지금으로부터 얼마 전부터 시작할지
+REMOVE_NEGATIVE = True
+PRECHECK  = True
+MAX_ATTEMPTS = 3                         # 추출이 실패한 granule(잘린 다운로드 등)을 다음 주기에 다시 시도할 횟수
+SEARCH = {k: PRODUCTS[k]["cmr"] for k in ("no2", "o3", "hcho")}  # 제품별 검색 조건 (tempo_l3_products)
+TILE_DIR  = r""   # 지정하면 추출한 granule마다 지도 타일 레이어도 생성 (tempo_l3_tiles.py)
+ARROW_DIR = r""   # 지정하면 추출한 granule마다 Arrow IPC 파일도 저장 (tempo_arrow.py, 메모리 맵 읽기용)
+STUB_DIR  = r""   # 지정하면 CMR 대신 이 폴더의 granule을 STUB_INTERVAL_S마다 하나씩 공개하는 스텁 사용
+STUB_INTERVAL_S = 20
+
+def _iso(ts: pd.Timestamp) -> str:
+    return ts.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+# ===== 검색 원천 =====
+class EarthaccessSource:
+    """CMR 검색 + 적응형 다운로드 스케줄러(최신 우선)"""
+
+    def __init__(self, search: dict, bbox, raw_dir: str):
+        import earthaccess
+        if not earthaccess.login(persist=True):
+            raise RuntimeError("Earthdata 로그인 실패")
+        self.ea, self.search_kw, self.bbox, self.raw_dir = earthaccess, search, bbox, raw_dir
+
+    def search(self, kind: str, since: pd.Timestamp) -> list:
+        now = pd.Timestamp.now(tz="UTC")
+        results = self.ea.search_data(temporal=(_iso(since), _iso(now)), bounding_box=self.bbox,
+                                      **self.search_kw[kind])
+        jobs = []
+        for g in results:
+            links = g.data_links()
+            if not links:
+                continue
+            fname = links[0].rsplit("/", 1)[-1]
+            try:
+                end = pd.Timestamp(g["umm"]["TemporalExtent"]["RangeDateTime"]["EndingDateTime"])
+            except (KeyError, TypeError, ValueError):
+                end = time_from_filename(fname)
+            published = g.get("meta", {}).get("revision-date")
+            jobs.append({"url": links[0], "fname": fname, "path": os.path.join(self.raw_dir, fname),
+                         "time": end.timestamp(), "end": end,
+                         "published": pd.Timestamp(published) if published else None})
+        return jobs
+
+    def fetch(self, jobs: list) -> list:
+        from tempo_download_scheduler import DownloadScheduler
+        sched = DownloadScheduler(session_factory=self.ea.get_requests_https_session)
+        rep = sched.run(jobs, order="newest")
+        for url, err in rep["failed"]:
+            print(f"[FAIL] {url.rsplit('/', 1)[-1]} -> {err}")
+        return rep["files"]
+
+class StubSource:
+    """테스트용 로컬 카탈로그: src_dir의 granule을 끝 시각순으로 interval_s마다 하나씩 '공개'"""
+
+    def __init__(self, src_dir: str, raw_dir: str, interval_s: float = 20):
+        self.raw_dir, self.interval_s, self.t0 = raw_dir, interval_s, time.time()
+        items = []
+        for p in glob(os.path.join(src_dir, "*.nc")):
+            with netCDF4.Dataset(p) as nc:
+                _, end, _ = coverage_times({k: nc.getncattr(k) for k in nc.ncattrs()}, p)
+            items.append((end, p))
+        self.items = sorted(items)
+
+    def search(self, kind: str, since: pd.Timestamp) -> list:
+        n = int((time.time() - self.t0) // self.interval_s) + 1
+        jobs = []
+        for i, (end, p) in enumerate(self.items[:n]):
+            if kind_from_filename(p) != kind or end <= since:
+                continue
+            published = pd.Timestamp(self.t0 + i * self.interval_s, unit="s", tz="UTC")
+            fname = os.path.basename(p)
+            jobs.append({"url": p, "fname": fname, "path": os.path.join(self.raw_dir, fname),
+                         "time": end.timestamp(), "end": end, "published": published})
+        return jobs
+
+    def fetch(self, jobs: list) -> list:
+        out = []
+        for j in jobs:
+            shutil.copyfile(j["url"], j["path"] + ".part")
+            os.replace(j["path"] + ".part", j["path"])
+            out.append(j["path"])
+        return out
+
+# ===== 기록 =====
+def append_csv(df: pd.DataFrame, path: str):
+    # 열 구성은 첫 기록 기준으로 고정 (없는 열은 빈 값)
+    if os.path.exists(path):
+        cols = pd.read_csv(path, nrows=0).columns
+        df.reindex(columns=cols).to_csv(path, mode="a", header=False, index=False, encoding="utf-8")
+    else:
+        df.to_csv(path, index=False, encoding="utf-8")
+
+# ===== 상태 / 지표 =====
+def load_state(path: str, start: pd.Timestamp) -> dict:
+    """상태 파일이 있으면 이어서, 없으면 start부터"""
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            st = json.load(f)
+        st["hwm"] = {k: pd.Timestamp(v) for k, v in st["hwm"].items()}
+        st.setdefault("failed", {k: {} for k in SEARCH})
+        return st
+    return {"hwm": {k: start for k in SEARCH}, "seen": {k: [] for k in SEARCH}, "failed": {k: {} for k in SEARCH}}
+
+def save_state(st: dict, path: str):
+    out = {"hwm": {k: _iso(v) for k, v in st["hwm"].items()},
+           "seen": {k: v[-1000:] for k, v in st["seen"].items()},  # 최근 것만 유지
+           "failed": st["failed"]}  # {kind: {파일명: {"n": 실패 횟수, "end": 끝 시각}}} — 재시도 대기
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(out, f, ensure_ascii=False, indent=1)
+    os.replace(path + ".tmp", path)
+
+def publish_metric(rec: dict, out_dir: str, status: dict):
+    append_csv(pd.DataFrame([rec]), os.path.join(out_dir, "nrt_latency.csv"))
+    status[rec["product_kind"]] = rec
+    with open(os.path.join(out_dir, "nrt_status.json.tmp"), "w", encoding="utf-8") as f:
+        json.dump(status, f, ensure_ascii=False, indent=1, default=str)
+    os.replace(os.path.join(out_dir, "nrt_status.json.tmp"), os.path.join(out_dir, "nrt_status.json"))
+
+# ===== 폴링 =====
+def poll_once(source, st: dict, status: dict) -> int:
+    """제품별로 high-water mark 이후 새 granule을 처리. 추가한 행 수 반환
+    추출이 실패한 granule은 seen/hwm에 넣지 않고 MAX_ATTEMPTS번까지 다음 주기에 다시 받아 처리"""
+    added = 0
+    for kind in SEARCH:
+        seen, failed = set(st["seen"][kind]), st["failed"][kind]
+        # 재시도 대기 granule이 hwm - OVERLAP보다 오래됐어도 검색 범위에 들어오도록
+        since = min([st["hwm"][kind]] + [pd.Timestamp(f["end"]) for f in failed.values()]) - OVERLAP
+        jobs = [j for j in source.search(kind, since) if j["fname"] not in seen]
+        if not jobs:
+            continue
+        by_path = {j["path"]: j for j in jobs}
+        for path in sorted(source.fetch(jobs), key=lambda p: by_path[p]["end"]):
+            job = by_path[path]
+            try:
+                if PRECHECK:
+                    ok, why = precheck(path, kind, BBOX)
+                    df = extract_rows(path, kind, BBOX, REMOVE_NEGATIVE) if ok else None
+                else:
+                    ok, why, df = True, "", extract_rows(path, kind, BBOX, REMOVE_NEGATIVE)
+                if df is not None and len(df):
+                    append_csv(df, os.path.join(OUT_DIR, f"{kind}_nrt_NYC.csv"))
+                    if ARROW_DIR:
+                        from tempo_arrow import write_granule
+                        write_granule(df, kind, job["fname"], ARROW_DIR)
+                    if TILE_DIR:
+                        from tempo_l3_tiles import render_granule, update_layer_index
+                        render_granule(path, kind, tile_dir=TILE_DIR, bbox=BBOX)
+                        update_layer_index(TILE_DIR)
+                available = pd.Timestamp.now(tz="UTC")
+                rec = {
+                    "product_kind": kind, "source_file": job["fname"], "granule_end_utc": _iso(job["end"]),
+                    "available_utc": _iso(available), "rows": 0 if df is None else len(df),
+                    "latency_s": round((available - job["end"]).total_seconds(), 1),
+                    "since_publish_s": round((available - job["published"]).total_seconds(), 1)
+                                       if job.get("published") is not None else None,
+                    "skipped": why,
+                }
+                publish_metric(rec, OUT_DIR, status)
+                added += rec["rows"]
+                print(f"[OK] {job['fname']} rows={rec['rows']} latency={rec['latency_s']:.0f}s"
+                      + (f" (사전 점검: {why})" if why else ""))
+            except Exception as e:
+                n = failed.get(job["fname"], {}).get("n", 0) + 1
+                if n < MAX_ATTEMPTS:
+                    failed[job["fname"]] = {"n": n, "end": _iso(job["end"])}
+                    print(f"[RETRY] {job['fname']} -> {e} (시도 {n}/{MAX_ATTEMPTS})")
+                    continue
+                print(f"[SKIP] {job['fname']} -> {e} ({n}회 실패, 포기)")
+            failed.pop(job["fname"], None)
+            st["seen"][kind].append(job["fname"])
+            st["hwm"][kind] = max(st["hwm"][kind], job["end"])
+    return added
+
+def main(max_cycles=None):
+    os.makedirs(OUT_DIR, exist_ok=True)
+    os.makedirs(RAW_DIR, exist_ok=True)
+    source = StubSource(STUB_DIR, RAW_DIR, STUB_INTERVAL_S) if STUB_DIR else \
+             EarthaccessSource(SEARCH, BBOX, RAW_DIR)
+    state_path = os.path.join(OUT_DIR, "nrt_state.json")
+    # 스텁 granule은 과거 시각이므로 처음부터
+    start = pd.Timestamp(0, tz="UTC") if STUB_DIR else pd.Timestamp.now(tz="UTC") - START_AT
+    st = load_state(state_path, start)
+    status = {}
+    print(f"▶ 폴링 시작: {', '.join(f'{k}>{_iso(v)}' for k, v in st['hwm'].items())}, 주기 {POLL_S}s")
+
+    cycle = 0
+    try:
+        while max_cycles is None or cycle < max_cycles:
+            t = time.time()
+            n = poll_once(source, st, status)
+            save_state(st, state_path)
+            cycle += 1
+            print(f"[{_iso(pd.Timestamp.now(tz='UTC'))}] 주기 {cycle}: 새 행 {n:,}")
+            time.sleep(max(0.0, POLL_S - (time.time() - t)))
+    except KeyboardInterrupt:
+        save_state(st, state_path)
+        print("\n중지: 상태 저장 완료")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import os
 import earthaccess
 
+from tempo_download_scheduler import DownloadScheduler, jobs_from_granules, print_report
+
 # 1) Earthdata 로그인
 ok = earthaccess.login(persist=True)
 if not ok:
@@ -14,6 +16,15 @@ BBOX = (-74.3, 40.4, -73.6, 41.0)       # NYC
 START_DATE = "2025-06-01"
 END_DATE   = "2025-06-10"
 
+PRIORITY    = "oldest"  # "oldest": 백필(오래된 것부터) / "newest": 운영(최신부터)
+MAX_WORKERS = 16        # 동시 다운로드 상한 (처리량/오류율에 따라 2~상한 사이에서 자동 조절)
+
+CATALOG_DB = r""  # 지정하면 중복 확인을 카탈로그로 하고, 받은 파일을 바로 수집(tempo_catalog.py)
+
+CROP_DIR = r""            # 지정하면 받은 granule을 바로 BBOX 창만 남긴 작은 파일로 재저장 → CROP_DIR/nyc (tempo_l3_crop_ingest.py)
+CROP_ORIGINAL = "delete"  # 크롭 후 원본: "delete" / "archive"(CROP_ARCHIVE_DIR로 이동) / "keep"
+CROP_ARCHIVE_DIR = r""
+
 os.makedirs(OUTROOT, exist_ok=True)
 print(f"\n=== TEMPO NO₂ L3 V03 검색: {START_DATE} ~ {END_DATE}, BBOX={BBOX} ===")
 
@@ -28,26 +39,45 @@ print(f"▶ 발견된 granule 수: {len(results)}")
 if not results:
     print(" 해당 기간/영역에 데이터가 없습니다.")
 else:
-    # 이미 받은 파일 제외
-    have = set(os.listdir(OUTROOT))
+    # 이미 받은 파일 제외 (카탈로그가 있으면 폴더 스캔 대신 인덱스 조회)
+    if CATALOG_DB:
+        from tempo_catalog import connect, has_file, ingest_files
+        con = connect(CATALOG_DB)
+        is_new = lambda fname: not has_file(con, fname)
+    else:
+        have = set(os.listdir(OUTROOT))
+        if CROP_DIR and os.path.isdir(os.path.join(CROP_DIR, "nyc")):
+            have |= set(os.listdir(os.path.join(CROP_DIR, "nyc")))  # 크롭 후 원본을 지운 경우
+        is_new = lambda fname: fname not in have
     filtered = []
     for g in results:
         links = g.data_links()
         if not links:
             continue
         fname = links[0].rsplit("/", 1)[-1]
-        if fname not in have:
+        if is_new(fname):
             filtered.append(g)
     print(f"▶ 다운로드 대상: {len(filtered)} (이미 존재 {len(results)-len(filtered)}개 제외)")
 
-    # 4) 다운로드 실행
-    files = earthaccess.download(
-        filtered,
-        local_path=OUTROOT,  
-        threads=8            # 병렬 다운로드 
-    )
+    # 4) 다운로드 실행 — 세션 재사용 + 적응형 동시성 + 재시도/백오프
+    sched = DownloadScheduler(session_factory=earthaccess.get_requests_https_session,
+                              max_workers=MAX_WORKERS)
+    report = sched.run(jobs_from_granules(filtered, OUTROOT), order=PRIORITY)
 
     # 5) 결과 리포트
-    got = [f for f in files if f]
+    got = report["files"]
     print(f"\n 다운로드 완료: {len(got)}개 파일 저장 완료")
+    print_report(report)
     print(f" 저장 폴더: {OUTROOT}")
+
+    # 6) 수집 직후 크롭 (이후 추출은 CROP_DIR/nyc 를 읽음)
+    if CROP_DIR:
+        from tempo_l3_crop_ingest import crop_files
+        got = crop_files(got, regions={"nyc": BBOX}, out_dir=CROP_DIR,
+                         action=CROP_ORIGINAL, archive_dir=CROP_ARCHIVE_DIR)
+
+    # 7) 카탈로그 수집 (시각/범위/영역별 유효 픽셀 수를 한 번만 기록)
+    if CATALOG_DB:
+        added, skipped, failed = ingest_files(con, got)
+        con.close()
+        print(f" 카탈로그 수집: 새로 기록 {added}, 변경 없음 {skipped}, 실패 {failed} ({CATALOG_DB})")
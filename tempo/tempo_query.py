@@ -0,0 +1,197 @@
+# tempo_query.py
+# 추출 결과 SQL 조회 계층 — 내장 DuckDB + 파티션된 Parquet
+# 1) ingest: 추출 스크립트 CSV → 공통 스키마로 정규화 → LAKE_DIR/product_kind=<kind>/date=<YYYY-MM-DD>/<원본 이름>.parquet
+#    (파일 안은 SORT_BY 순으로 정렬 → row group 최소/최대 통계가 좁아짐)
+# 2) query: 제품/기간/영역/QA/구름 조건 → 파티션 가지치기(product_kind, date) + row group 통계로 필요한 부분만 읽음
+#    결과는 pyarrow.Table (to_pandas()로 변환 가능)
+# 공통 열: time_utc, latitude, longitude, value, cloud_fraction, qa_value, units, source_file (+ 원본의 나머지 열)
+
+import os, re, time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import duckdb
+
+from tempo_l3_products import PRODUCTS, kind_from_filename
+
+# ===== 사용자 설정 =====
+CSV_INPUTS = []        # 추출 결과 CSV 목록 (제품당 한 종류의 출력만 넣을 것 — 같은 granule이 중복되지 않도록)
+LAKE_DIR   = r""       # Parquet 데이터셋 폴더
+SORT_BY    = ("latitude", "time_utc")  # 하루 파일 안의 정렬 순서 (영역 조건 가지치기에 유리)
+ROW_GROUP_SIZE = 65536
+REGIONS = {            # query(region=...)에 쓰는 이름 → BBOX (lon_min, lat_min, lon_max, lat_max)
+    "nyc":       (-74.3, 40.4, -73.6, 41.0),
+    "manhattan": (-74.03, 40.69, -73.90, 40.88),
+    "bronx":     (-73.94, 40.78, -73.76, 40.92),
+    "brooklyn":  (-74.05, 40.56, -73.83, 40.74),
+    "queens":    (-73.97, 40.54, -73.69, 40.81),
+}
+
+TIME_CANDS  = ["time_utc", "time_mid_utc", "time"]
+LAT_CANDS   = ["latitude", "lat"]
+LON_CANDS   = ["longitude", "lon"]
+UNITS_CANDS = ["units", "no2_units", "hcho_units", "o3_units"]
+
+def _first(cols, cands):
+    return next((c for c in cands if c in cols), None)
+
+def _lake(lake_dir: str) -> str:
+    # 빈 경로면 현재 폴더에 파티션이 흩어지므로 거부
+    if not lake_dir:
+        raise ValueError("LAKE_DIR(lake_dir)가 비어 있습니다 — Parquet 데이터셋 폴더를 지정하세요")
+    return lake_dir
+
+def _utc(ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+# ===== 적재 =====
+def _wide_to_long(df: pd.DataFrame) -> list:
+    # tempo_multi_l3_aligned.py 출력(제품별 열) → 제품별 긴 형식
+    out = []
+    for kind, spec in PRODUCTS.items():
+        col = spec["column"]
+        if col not in df.columns:
+            continue
+        part = df[["time_utc", "latitude", "longitude", col]].rename(columns={col: "value"})
+        if f"{kind}_cloud_fraction" in df.columns:
+            part["cloud_fraction"] = df[f"{kind}_cloud_fraction"]
+        part["source_file"] = df.get(f"{kind}_source_file", "")
+        out.append((kind, part.dropna(subset=["value"])))
+    return out
+
+def normalize(df: pd.DataFrame, kind: str = None) -> list:
+    """추출 CSV 한 개 → [(kind, 공통 스키마 DataFrame)]"""
+    if any(f"{k}_source_file" in df.columns for k in PRODUCTS):
+        pairs = _wide_to_long(df)
+    else:
+        cols = list(df.columns)
+        if kind is None:  # product_kind 열 → 값 열 이름 → 원본 파일명 순
+            if "product_kind" in cols and df["product_kind"].notna().any():
+                kind = str(df["product_kind"].dropna().iloc[0])
+            else:
+                kind = next((k for k, s in PRODUCTS.items() if _first(cols, [s["column"]] + s["main"])), None)
+            if kind is None and "source_file" in cols:
+                kind = kind_from_filename(str(df["source_file"].iloc[0]))
+        if kind not in PRODUCTS:
+            raise ValueError(f"제품 종류를 알 수 없음: {kind}")
+        spec = PRODUCTS[kind]
+        ren = {
+            _first(cols, TIME_CANDS): "time_utc",
+            _first(cols, LAT_CANDS): "latitude",
+            _first(cols, LON_CANDS): "longitude",
+            _first(cols, [spec["column"]] + spec["main"]): "value",
+            _first(cols, spec["cloud"]): "cloud_fraction",
+            _first(cols, UNITS_CANDS): "units",
+        }
+        ren.pop(None, None)
+        if "value" not in ren.values():
+            raise ValueError(f"{kind} 값 열을 찾을 수 없음: {cols}")
+        pairs = [(kind, df.drop(columns=["product_kind"], errors="ignore").rename(columns=ren))]
+
+    out = []
+    for kind, d in pairs:
+        d = d.copy()
+        d["time_utc"] = pd.to_datetime(d["time_utc"], utc=True)
+        for c in ("value", "cloud_fraction", "qa_value", "latitude", "longitude"):
+            d[c] = pd.to_numeric(d[c], errors="coerce") if c in d.columns else np.nan
+        for c in ("units", "source_file"):
+            d[c] = d[c].fillna("").astype(str) if c in d.columns else ""
+        out.append((kind, d.dropna(subset=["value"])))
+    return out
+
+def ingest_csv(csv_path: str, lake_dir: str = LAKE_DIR, kind: str = None) -> int:
+    """CSV 하나를 (제품, 날짜) 파티션으로 나눠 저장. 같은 CSV를 다시 넣으면 같은 파일을 덮어씀. 기록 행 수 반환"""
+    lake_dir = _lake(lake_dir)
+    stem = re.sub(r"[^\w.-]", "_", os.path.splitext(os.path.basename(csv_path))[0])
+    n = 0
+    for k, d in normalize(pd.read_csv(csv_path), kind):
+        for day, part in d.groupby(d["time_utc"].dt.strftime("%Y-%m-%d")):
+            out_dir = os.path.join(lake_dir, f"product_kind={k}", f"date={day}")
+            os.makedirs(out_dir, exist_ok=True)
+            part = part.sort_values(list(SORT_BY)).reset_index(drop=True)
+            path = os.path.join(out_dir, f"{stem}.parquet")
+            pq.write_table(pa.Table.from_pandas(part, preserve_index=False), path + ".part",
+                           row_group_size=ROW_GROUP_SIZE, compression="zstd")
+            os.replace(path + ".part", path)
+            n += len(part)
+    return n
+
+# ===== 조회 =====
+def connect(lake_dir: str = LAKE_DIR) -> duckdb.DuckDBPyConnection:
+    """'tempo' 뷰가 등록된 DuckDB 연결 (뷰를 통한 조건도 파티션/row group 가지치기가 적용됨)"""
+    src = os.path.join(_lake(lake_dir), "*", "*", "*.parquet").replace("'", "''")
+    con = duckdb.connect()
+    con.execute(f"""CREATE VIEW tempo AS SELECT * FROM read_parquet('{src}', hive_partitioning=true,
+                    union_by_name=true, hive_types={{'product_kind': VARCHAR, 'date': DATE}})""")
+    return con
+
+def query(con=None, kinds=None, start=None, end=None, region=None, cloud_max=None, qa_max=None,
+          where: str = None, columns: str = "*", order_by: str = "time_utc, latitude, longitude") -> pa.Table:
+    """조건 조회 → pyarrow.Table. start/end는 UTC (end 미포함), region은 REGIONS 이름 또는 BBOX"""
+    con = con or connect()
+    cond, params = [], []
+    if kinds:
+        kinds = [kinds] if isinstance(kinds, str) else list(kinds)
+        cond.append(f"product_kind IN ({', '.join('?' * len(kinds))})")
+        params += kinds
+    if start is not None:
+        start = _utc(start)
+        cond += ["date >= ?::DATE", "time_utc >= ?"]
+        params += [start.strftime("%Y-%m-%d"), start.to_pydatetime()]
+    if end is not None:
+        end = _utc(end)
+        cond += ["date <= ?::DATE", "time_utc < ?"]
+        params += [end.strftime("%Y-%m-%d"), end.to_pydatetime()]
+    if region is not None:
+        lon_min, lat_min, lon_max, lat_max = REGIONS[region] if isinstance(region, str) else region
+        cond += ["latitude BETWEEN ? AND ?", "longitude BETWEEN ? AND ?"]
+        params += [lat_min, lat_max, lon_min, lon_max]
+    if cloud_max is not None:
+        cond.append("cloud_fraction <= ?")
+        params.append(cloud_max)
+    if qa_max is not None:
+        cond.append("qa_value <= ?")
+        params.append(qa_max)
+    if where:
+        cond.append(f"({where})")
+    sql = f"SELECT {columns} FROM tempo" + (f" WHERE {' AND '.join(cond)}" if cond else "") \
+          + (f" ORDER BY {order_by}" if order_by else "")
+    return _arrow(con.execute(sql, params))
+
+def sql(text: str, con=None, params=None) -> pa.Table:
+    """'tempo' 뷰에 대한 임의 SQL → pyarrow.Table"""
+    con = con or connect()
+    return _arrow(con.execute(text, params or []))
+
+def _arrow(res) -> pa.Table:
+    tbl = res.arrow()
+    return tbl.read_all() if isinstance(tbl, pa.RecordBatchReader) else tbl
+
+def main():
+    _lake(LAKE_DIR)
+    t = time.perf_counter()
+    for p in CSV_INPUTS:
+        try:
+            print(f"[OK] {os.path.basename(p)} → {ingest_csv(p, LAKE_DIR):,} rows")
+        except Exception as e:
+            print(f"[SKIP] {os.path.basename(p)} -> {e}")
+    print(f"▶ 적재 {time.perf_counter() - t:.1f}s → {LAKE_DIR}")
+
+    # 예: 7월 중 브롱크스 NO2가 기준을 넘은 시각 (구름 비율 < 0.2)
+    con = connect(LAKE_DIR)
+    t = time.perf_counter()
+    tbl = sql("""SELECT time_utc, count(*) AS n_pixels, avg(value) AS no2_mean, max(value) AS no2_max
+                 FROM tempo
+                 WHERE product_kind = 'no2' AND date BETWEEN DATE '2025-07-01' AND DATE '2025-07-31'
+                   AND latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?
+                   AND cloud_fraction < 0.2 AND value > 1e16
+                 GROUP BY time_utc ORDER BY time_utc""",
+              con, [REGIONS["bronx"][1], REGIONS["bronx"][3], REGIONS["bronx"][0], REGIONS["bronx"][2]])
+    print(f"▶ 예시 조회: {tbl.num_rows}개 시각, {time.perf_counter() - t:.3f}s")
+    print(tbl.to_pandas().head(10).to_string(index=False))
+    print(f"\n✅ 완료")
+
+if __name__ == "__main__":
+    main()